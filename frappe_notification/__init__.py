@@ -2,11 +2,11 @@
 __version__ = '0.0.1'
 
 from .utils.exceptions import *  # noqa
-from .utils.client import get_active_notification_client, set_active_notification_client  # noqa
+from .utils.client import get_active_notification_client, get_active_notification_client_info, set_active_notification_client  # noqa
 from .frappe_notification.doctype.notification_client import NotificationClient, NotificationClientFixtures  # noqa
-from .frappe_notification.doctype.notification_channel import NotificationChannel, NotificationChannelFixtures  # noqa
-from .frappe_notification.doctype.notification_outbox import NotificationOutbox, NotificationOutboxStatus, NotificationOutboxFixtures, RecipientsBatchItem  # noqa
-from .frappe_notification.doctype.notification_template import NotificationTemplate, NotificationRecipientItem, NotificationTemplateFixtures  # noqa
+from .frappe_notification.doctype.notification_channel import NotificationChannel, NotificationChannelFixtures, acquire_send_token, clear_channel_cache, clear_channel_registry, get_channel_config, get_channel_configs  # noqa
+from .frappe_notification.doctype.notification_outbox import NotificationOutbox, NotificationOutboxStatus, NotificationPriority, NotificationOutboxFixtures, RecipientsBatchItem, defer_outbox_recipients, get_idempotent_outbox, get_outbox_without_recipients, update_outbox_recipient_status  # noqa
+from .frappe_notification.doctype.notification_template import NotificationTemplate, NotificationRecipientItem, NotificationTemplateFixtures, TEMPLATE_KEYS_CACHE_KEY, clear_template_key_cache, queue_notifications  # noqa
 
 
 from unittest import TestLoader, TestSuite
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from frappe_notification.frappe_notification.controllers.clients import (
     create_notification_client as _create_notification_client,
@@ -7,6 +7,8 @@ from frappe_notification.frappe_notification.controllers.clients import (
     get_notification_client as _get_notification_client,
     get_notification_logs as _get_notification_logs,
     mark_log_seen as _mark_log_seen,
+    mark_logs_seen as _mark_logs_seen,
+    get_unread_count as _get_unread_count,
     get_me as _get_me
 )
 from frappe_notification.frappe_notification.controllers.clients.get_notification_logs import \
@@ -61,6 +63,7 @@ def get_me():
 def get_notification_logs(args: GetNotificationLogsExecutionArgs):
     """
     Fetches a list of Notifications sent to a specific user via specific channel
+    args.count_mode: "cached" (default), "exact" or "none". How totalCount is resolved
     """
     return _get_notification_logs(args)
 
@@ -86,3 +89,44 @@ def mark_log_seen(
     )
 
     return dict(marked=t)
+
+
+@frappe_notification_api()
+def mark_logs_seen(
+        outbox_recipient_rows: Optional[List[str]] = None,
+        outboxes: Optional[List[str]] = None,
+        until_cursor: Optional[str] = None,
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None,
+):
+    """
+    Marks many logs as seen at once, by their rows, by their outboxes or all the logs until
+    a cursor. Information on how to treat the parameters can be found in the controller method
+    """
+    n = _mark_logs_seen(
+        outbox_recipient_rows=outbox_recipient_rows,
+        outboxes=outboxes,
+        until_cursor=until_cursor,
+        user_identifier=user_identifier,
+        channel=channel,
+        channel_id=channel_id,
+    )
+
+    return dict(marked=n)
+
+
+@frappe_notification_api()
+def get_unread_count(
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None,
+):
+    """
+    Number of logs not seen yet by a user_identifier, or by a channel & channel_id
+    """
+    return dict(unread_count=_get_unread_count(
+        user_identifier=user_identifier,
+        channel=channel,
+        channel_id=channel_id,
+    ))
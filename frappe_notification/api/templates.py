@@ -5,7 +5,11 @@ from frappe_notification.frappe_notification.controllers.templates import (
     delete_template as _delete_template,
     create_template as _create_template,
     fork_template as _fork_template,
-    send_notification as _send_notification
+    send_notification as _send_notification,
+    send_notifications_bulk as _send_notifications_bulk,
+    begin_notification as _begin_notification,
+    append_notification_recipients as _append_notification_recipients,
+    finalize_notification as _finalize_notification,
 )
 from frappe_notification.utils import frappe_notification_api
 
@@ -18,15 +22,101 @@ def send_notification(args: dict):
     args {
         template_key: str,
         context: dict,
-        recipients: List[dict]
+        recipients: List[dict],
+        async: bool,
+        priority: "High" | "Normal" | "Bulk",
+        idempotency_key: str
     }
+
+    With args.async, the Outbox is returned right away with status `Queued`
+    args.priority overrides the priority of the template
+    args.recipients[].context is overlaid on args.context for that recipient alone
+    Retries with the same args.idempotency_key return the Outbox of the first send, for a day
     """
     t = _send_notification(
         context=args.get("context"),
         template_key=args.get("template_key"),
         recipients=args.get("recipients"),
+        enqueue=bool(args.get("async")),
+        priority=args.get("priority"),
+        idempotency_key=args.get("idempotency_key"),
     )
-    return t.as_dict()
+    r = t.as_dict()
+    r.pop("queued_args", None)
+    r.update(t.get_content())
+    return r
+
+
+@frappe_notification_api()
+def send_notifications_bulk(args: dict):
+    """
+    Send out many notifications in a single request
+
+    args {
+        sends: List[{
+            template_key: str,
+            context: dict,
+            recipients: List[dict],
+            priority: "High" | "Normal" | "Bulk",
+            idempotency_key: str
+        }],
+        async: bool
+    }
+
+    Returns a result for each of args.sends, in the same order
+    results[] is { outbox, status } on success, { error_code, message } otherwise
+    """
+    results = _send_notifications_bulk(
+        sends=args.get("sends"),
+        enqueue=bool(args.get("async")),
+    )
+    return dict(results=results)
+
+
+@frappe_notification_api()
+def begin_notification(args: dict):
+    """
+    Start a notification with a very large number of recipients, appended in chunks
+
+    args {
+        template_key: str,
+        context: dict,
+        priority: "High" | "Normal" | "Bulk",
+        idempotency_key: str
+    }
+
+    Returns the Draft Outbox. Append the recipients with append_notification_recipients,
+    then send it out with finalize_notification
+    """
+    t = _begin_notification(
+        template_key=args.get("template_key"),
+        context=args.get("context"),
+        priority=args.get("priority"),
+        idempotency_key=args.get("idempotency_key"),
+    )
+    r = t.as_dict()
+    r.pop("queued_args", None)
+    r.update(t.get_content())
+    return r
+
+
+@frappe_notification_api()
+def append_notification_recipients(outbox: str, recipients: list):
+    """
+    Append a chunk of recipients to a Draft Outbox, at most 10000 at a time
+    Nothing is appended when any one of them is invalid
+    """
+    t = _append_notification_recipients(outbox=outbox, recipients=recipients)
+    return dict(outbox=t.name, recipients_count=t.pending_count)
+
+
+@frappe_notification_api()
+def finalize_notification(outbox: str):
+    """
+    Send out a Draft Outbox, with all the recipients appended to it
+    """
+    t = _finalize_notification(outbox=outbox)
+    return dict(outbox=t.name, status=t.status, recipients_count=t.pending_count)
 
 
 @frappe_notification_api()
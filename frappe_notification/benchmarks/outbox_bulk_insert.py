@@ -0,0 +1,65 @@
+"""
+Outbox Items insertion: ORM vs multi-row INSERTs
+
+Usage:
+    bench --site <site> execute frappe_notification.benchmarks.outbox_bulk_insert.execute
+    bench --site <site> execute frappe_notification.benchmarks.outbox_bulk_insert.execute \
+        --kwargs "{'sizes': [1000, 10000, 100000], 'orm_limit': 10000}"
+
+Everything is rolled back at the end. Nothing gets dispatched, the Outboxes stay drafts.
+"""
+import time
+from typing import List
+
+import frappe
+from frappe_notification import NotificationOutbox
+
+
+def execute(sizes: List[int] = (1000, 10000, 100000), orm_limit: int = 10000):
+    """
+    orm_limit: Skip the ORM run above these many recipients, it takes way too long
+    """
+    client = frappe.db.get_value("Notification Client", {})
+    channel = frappe.db.get_value("Notification Channel", {"enabled": 1})
+    if not client or not channel:
+        print("Please create a Notification Client & an enabled Notification Channel")
+        return
+
+    print(f"{'Recipients':>12} {'ORM (s)':>10} {'Bulk (s)':>10}")
+    try:
+        for size in sizes:
+            recipients = [
+                dict(channel=channel, channel_id=f"channel-id-{i}", user_identifier=f"user-{i}")
+                for i in range(size)
+            ]
+
+            orm_time = None
+            if size <= orm_limit:
+                orm_time = _time_it(lambda: _get_outbox(client, recipients).insert())
+
+            bulk_time = _time_it(
+                lambda: _get_outbox(client, []).insert().insert_recipients_in_bulk(recipients))
+
+            print(f"{size:>12} {_format(orm_time):>10} {_format(bulk_time):>10}")
+    finally:
+        frappe.db.rollback()
+
+
+def _get_outbox(client: str, recipients: List[dict]) -> NotificationOutbox:
+    return frappe.get_doc(dict(
+        doctype="Notification Outbox",
+        notification_client=client,
+        subject="Benchmark",
+        content="Benchmark",
+        recipients=recipients,
+    ))
+
+
+def _time_it(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _format(t):
+    return "-" if t is None else f"{t:.2f}"
@@ -0,0 +1,51 @@
+"""
+Jobs enqueued by NotificationOutbox.send_pending_notifications for batching channels
+
+Usage:
+    bench --site <site> execute frappe_notification.benchmarks.outbox_dispatch.execute
+    bench --site <site> execute frappe_notification.benchmarks.outbox_dispatch.execute \
+        --kwargs "{'channel': 'FCM', 'sizes': [1000, 10000, 100000]}"
+
+Nothing is written to the db & no job is actually enqueued
+"""
+import time
+from typing import List
+from unittest.mock import patch
+
+import frappe
+from frappe_notification import NotificationOutbox
+
+
+def execute(channel: str = "FCM", sizes: List[int] = (1000, 10000, 100000)):
+    batch_size = None
+    if frappe.db.get_value("Notification Channel", channel, "batch_recipients"):
+        batch_size = frappe.db.get_value("Notification Channel", channel, "batch_recipients_size")
+    print(f"Channel: {channel}, Batch Size: {batch_size or 'Not Batched'}")
+
+    print(f"{'Recipients':>12} {'Jobs':>10} {'Time (s)':>10}")
+    for size in sizes:
+        outbox = NotificationOutbox(dict(
+            doctype="Notification Outbox",
+            name="benchmark-outbox",
+            subject="Benchmark",
+            content="Benchmark",
+            recipients=[
+                dict(
+                    name=f"row-{i}",
+                    channel=channel,
+                    channel_id=f"channel-id-{i}",
+                    user_identifier=f"user-{i}")
+                for i in range(size)
+            ]))
+        outbox._channel_handlers = {channel: _dummy_handler}
+
+        with patch("frappe.enqueue") as mock_enqueue:
+            start = time.perf_counter()
+            outbox.send_pending_notifications()
+            t = time.perf_counter() - start
+
+        print(f"{size:>12} {mock_enqueue.call_count:>10} {t:>10.2f}")
+
+
+def _dummy_handler(**kwargs):
+    pass
@@ -5,6 +5,8 @@ from .get_client import get_notification_client  # noqa
 from .get_me import get_me  # noqa
 from .get_notification_logs import get_notification_logs  # noqa
 from .mark_log_seen import mark_log_seen  # noqa
+from .get_unread_count import get_unread_count  # noqa
+from .mark_logs_seen import mark_logs_seen  # noqa
 
 
 from unittest import TestLoader, TestSuite
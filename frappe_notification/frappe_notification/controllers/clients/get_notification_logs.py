@@ -3,10 +3,10 @@ from frappe_notification import (
     NotificationClientNotFound,
     InvalidRequest,
     get_active_notification_client)
-from typing import Optional
+from typing import Optional, Tuple
 from frappe_notification.utils.cursor_paginator import CursorPaginator, \
-    CursorPaginatorExecutionArgs, CursorPaginatorSortBy, CursorPaginatorSortByField, \
-    CursorPaginatorSortByDirection
+    CursorPaginatorCountMode, CursorPaginatorExecutionArgs, CursorPaginatorSortBy, \
+    CursorPaginatorSortByField, CursorPaginatorSortByDirection
 
 
 class NotificationLogsFilters(frappe._dict):
@@ -16,7 +16,8 @@ class NotificationLogsFilters(frappe._dict):
 
 
 class NotificationLogsSortByEnum(CursorPaginatorSortByField):
-    CREATION = "outbox.creation"
+    # The logs of an Outbox share its creation, name keeps the cursors unique
+    CREATION = ("log.outbox_creation", "log.name")
 
 
 class NotificationLogSortBy(CursorPaginatorSortBy):
@@ -30,9 +31,14 @@ class GetNotificationLogsExecutionArgs(CursorPaginatorExecutionArgs):
     last: Optional[int]
     sort_by: Optional[NotificationLogSortBy]
     filters: NotificationLogsFilters
+    count_mode: Optional[str]
 
 
 def get_notification_logs(args: GetNotificationLogsExecutionArgs):
+    """
+    totalCount is cached for a minute by default, so that paging through the logs doesn't count
+    them again on every page. args.count_mode could be set to "exact" or "none" instead
+    """
     filters = args.pop('filters', None)
 
     # TODO: Find a better way to resolve these values..
@@ -49,9 +55,11 @@ def get_notification_logs(args: GetNotificationLogsExecutionArgs):
         skip_process_filters=True,
         count_resolver=get_notification_logs_count_resolver,
         node_resolver=get_notification_logs_node_resolver,
-        default_sorting_fields=["outbox.creation"],
+        default_sorting_fields=list(NotificationLogsSortByEnum.CREATION.value),
         default_sorting_direction="desc",
-        extra_args={"filters": filters}
+        extra_args={"filters": filters},
+        count_mode=CursorPaginatorCountMode.CACHED,
+        count_cache_key=[get_active_notification_client()]
     )
     return r.execute(args)
 
@@ -61,27 +69,32 @@ def get_notification_logs_count_resolver(paginator: CursorPaginator, filters):
     if not client:
         raise NotificationClientNotFound()
     notification_filters = paginator.extra_args.get("filters") if paginator.extra_args else None
-    conditions = get_notifications_logs_filters(NotificationLogsFilters(notification_filters or {}))
+    conditions, values = get_notifications_logs_filters(
+        NotificationLogsFilters(notification_filters or {}))
 
     return frappe.db.sql(f"""
     SELECT
-        count(distinct(outbox.name))
+        count(distinct(log.outbox))
     FROM
-        `tabNotification Outbox` outbox
-    JOIN `tabNotification Outbox Recipient Item` recipient_item
-        ON recipient_item.parent = outbox.name AND recipient_item.parenttype = 'Notification Outbox'
+        `tabNotification Recipient Log` log
     WHERE
-        outbox.notification_client = %(client)s
-        AND outbox.docstatus = 1
+        log.notification_client = %(client)s
         {conditions}
-        AND recipient_item.status = 'Success'
         """, {
+        **values,
         "client": client
     }, as_list=1, debug=0)[0][0]
 
 
 def get_notification_logs_node_resolver(paginator: CursorPaginator, filters, fields, sorting_fields,
                                         sort_dir, limit):
+    """
+    Notification Logs are read from Notification Recipient Log alone, a range scan on its
+    (client, user_identifier, outbox_creation) or (client, channel, channel_id, outbox_creation)
+    indexes. The contents are looked up by their primary key
+    InnoDB appends the primary key to these indexes, so they are read in the order of
+    (outbox_creation, name) as they are, without a filesort
+    """
     client = get_active_notification_client()
     if not client:
         raise NotificationClientNotFound()
@@ -90,39 +103,46 @@ def get_notification_logs_node_resolver(paginator: CursorPaginator, filters, fie
     order_by = ', '.join([f'{x} {sort_dir}' for x in sorting_fields])
 
     notification_filters = paginator.extra_args.get("filters") if paginator.extra_args else None
-    conditions = get_notifications_logs_filters(NotificationLogsFilters(notification_filters or {}),
-                                                filters)
+    conditions, values = get_notifications_logs_filters(
+        NotificationLogsFilters(notification_filters or {}), filters)
 
     return frappe.db.sql(f"""
     SELECT
-        outbox.name as outbox,
-        recipient_item.name as outbox_recipient_row,
-        outbox.subject,
-        outbox.content,
-        recipient_item.time_sent,
-        recipient_item.user_identifier,
-        recipient_item.channel,
-        recipient_item.channel_id,
-        recipient_item.seen
+        log.outbox,
+        log.name as outbox_recipient_row,
+        COALESCE(recipient_content.subject, outbox_content.subject) as subject,
+        COALESCE(recipient_content.content, outbox_content.content) as content,
+        log.time_sent,
+        log.user_identifier,
+        log.channel,
+        log.channel_id,
+        log.seen
         {extra_sorting_fields}
     FROM
-        `tabNotification Outbox` outbox
-    JOIN `tabNotification Outbox Recipient Item` recipient_item
-        ON recipient_item.parent = outbox.name AND recipient_item.parenttype = 'Notification Outbox'
+        `tabNotification Recipient Log` log
+    LEFT JOIN `tabNotification Content` outbox_content
+        ON outbox_content.name = log.outbox_content_hash
+    LEFT JOIN `tabNotification Content` recipient_content
+        ON recipient_content.name = log.content_hash
     WHERE
-        outbox.notification_client = %(client)s
-        AND outbox.docstatus = 1
+        log.notification_client = %(client)s
         {conditions}
-        AND recipient_item.status = "Success"
     ORDER BY {order_by}
     LIMIT %(limit_page_length)s
     """, {
+        **values,
         "client": client,
         "limit_page_length": limit
     }, as_dict=1, debug=0)
 
 
-def get_notifications_logs_filters(filters: NotificationLogsFilters, cursor_filters=None):
+def get_notifications_logs_filters(
+        filters: NotificationLogsFilters,
+        cursor_filters=None) -> Tuple[str, dict]:
+    """
+    Returns the conditions & the values they are parameterized with
+    cursor_filters are the conditions built by the paginator, with the values escaped already
+    """
     channel = filters.channel
     channel_id = filters.channel_id
     user_identifier = filters.user_identifier
@@ -133,17 +153,21 @@ def get_notifications_logs_filters(filters: NotificationLogsFilters, cursor_filt
         ))
 
     conditions = []
+    values = dict()
 
     if cursor_filters:
         conditions.extend(cursor_filters)
 
     if channel:
-        conditions.append(f"recipient_item.channel = '{channel}'")
+        conditions.append("log.channel = %(channel)s")
+        values["channel"] = channel
 
     if channel_id:
-        conditions.append(f"recipient_item.channel_id = '{channel_id}'")
+        conditions.append("log.channel_id = %(channel_id)s")
+        values["channel_id"] = channel_id
 
     if user_identifier:
-        conditions.append(f"recipient_item.user_identifier = '{user_identifier}'")
+        conditions.append("log.user_identifier = %(user_identifier)s")
+        values["user_identifier"] = user_identifier
 
-    return f' AND {" AND ".join(conditions)}' if len(conditions) else ""
+    return (f' AND {" AND ".join(conditions)}' if len(conditions) else ""), values
@@ -0,0 +1,33 @@
+from typing import Optional
+
+import frappe
+from frappe_notification import (
+    NotificationClientNotFound,
+    InvalidRequest,
+    get_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    get_unread_count as _get_unread_count
+
+
+def get_unread_count(
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None) -> int:
+    """
+    Number of Notification Logs not seen yet by the recipient, for the unread badges
+    The recipient is identified either by user_identifier or by channel & channel_id
+
+    Served from counters kept in redis, updated as the logs are sent & seen
+    """
+    client = get_active_notification_client()
+    if not client:
+        raise NotificationClientNotFound()
+
+    if not user_identifier and not (channel and channel_id):
+        raise InvalidRequest(frappe._("Please specify user_identifier or channel & channel_id"))
+
+    return _get_unread_count(
+        client,
+        user_identifier=user_identifier,
+        channel=None if user_identifier else channel,
+        channel_id=None if user_identifier else channel_id)
@@ -3,9 +3,10 @@ from typing import Optional
 import frappe
 from frappe_notification import (
     NotificationClientNotFound,
-    NotificationOutbox,
     NotificationOutboxNotFound,
     get_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    mark_recipient_logs_seen
 
 
 def mark_log_seen(
@@ -21,6 +22,8 @@ def mark_log_seen(
     - Specify channel & channel_id
     - Specify the name of the outbox_recipient_row name
     - Specify the user_identifier
+
+    Check mark_logs_seen to mark many logs at once
     """
 
     client = get_active_notification_client()
@@ -30,24 +33,22 @@ def mark_log_seen(
     if not frappe.db.exists("Notification Outbox", {"name": outbox, "notification_client": client}):
         raise NotificationOutboxNotFound(outbox=outbox)
 
-    outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", outbox)
-
-    _row = None
-    if channel and channel_id:
-        _row = [x for x in outbox.recipients if x.channel == channel and x.channel_id == channel_id]
-
-    if user_identifier:
-        _row = [x for x in outbox.recipients if x.user_identifier == user_identifier]
-
+    # The matching row is looked up by its parent, without loading the outbox
+    filters = dict(parent=outbox, parenttype="Notification Outbox")
     if outbox_recipient_row:
-        _row = [x for x in outbox.recipients if x.name == outbox_recipient_row]
-
-    if _row and isinstance(_row, list):
-        _row = _row[0]
+        filters.update(name=outbox_recipient_row)
+    elif user_identifier:
+        filters.update(user_identifier=user_identifier)
+    elif channel and channel_id:
+        filters.update(channel=channel, channel_id=channel_id)
+    else:
+        raise NotificationOutboxNotFound(outbox=outbox)
 
+    _row = frappe.db.get_value("Notification Outbox Recipient Item", filters, "name")
     if not _row:
-        raise NotificationOutboxNotFound(outbox=outbox.name)
+        raise NotificationOutboxNotFound(outbox=outbox)
 
-    _row.db_set("seen", 1)
+    frappe.db.set_value("Notification Outbox Recipient Item", _row, "seen", 1)
+    mark_recipient_logs_seen(row_names=[_row])
 
     return True
@@ -0,0 +1,82 @@
+import base64
+from typing import List, Optional
+
+import frappe
+from frappe_notification import (
+    NotificationClientNotFound,
+    InvalidRequest,
+    get_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    mark_recipient_logs_seen
+
+# Most outboxes or rows that could be marked in a single request
+MAX_MARK_LOGS_SEEN = 1000
+
+
+def mark_logs_seen(
+        outbox_recipient_rows: Optional[List[str]] = None,
+        outboxes: Optional[List[str]] = None,
+        until_cursor: Optional[str] = None,
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None,
+) -> int:
+    """
+    Marks many Notification Logs as seen at once, with a single UPDATE on the logs
+    The logs could be specified in 3 ways:
+    - outbox_recipient_rows: The logs, as in outbox_recipient_row of get_notification_logs
+    - outboxes: The logs of the recipient in these Outboxes
+    - until_cursor: A cursor of get_notification_logs. The log at the cursor & all the logs of
+                    the recipient sent before it are marked, like when the inbox is read
+
+    The recipient is identified by user_identifier or by channel & channel_id
+    It is required with outboxes & until_cursor
+
+    Returns the number of logs that were unseen till now
+    """
+    client = get_active_notification_client()
+    if not client:
+        raise NotificationClientNotFound()
+
+    if not (outbox_recipient_rows or outboxes or until_cursor):
+        raise InvalidRequest(frappe._(
+            "Please specify outbox_recipient_rows, outboxes or until_cursor"))
+
+    for ids in (outbox_recipient_rows, outboxes):
+        if ids and (not isinstance(ids, list) or len(ids) > MAX_MARK_LOGS_SEEN):
+            raise InvalidRequest(frappe._(
+                "Please specify a list of at most {0} ids").format(MAX_MARK_LOGS_SEEN))
+
+    if user_identifier:
+        channel = channel_id = None
+    elif not (channel and channel_id):
+        if outboxes or until_cursor:
+            raise InvalidRequest(frappe._(
+                "Please specify either (channel, channel_id) or user_identifier"))
+        channel = channel_id = None
+
+    return mark_recipient_logs_seen(
+        row_names=outbox_recipient_rows,
+        client=client,
+        outboxes=outboxes,
+        user_identifier=user_identifier,
+        channel=channel,
+        channel_id=channel_id,
+        until=_get_cursor_creation(until_cursor) if until_cursor else None,
+    )
+
+
+def _get_cursor_creation(cursor: str) -> str:
+    """
+    The logs are paged by (outbox_creation, name). Check get_notification_logs
+    The cursors made before name was added carry outbox_creation alone
+    """
+    try:
+        values = frappe.parse_json(frappe.safe_decode(base64.b64decode(cursor)))
+    except Exception:
+        values = None
+
+    if not isinstance(values, list) or len(values) not in (1, 2) or not values[0]:
+        raise InvalidRequest(frappe._("Invalid Cursor"))
+
+    return values[0]
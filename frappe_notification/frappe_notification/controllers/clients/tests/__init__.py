@@ -6,6 +6,8 @@ from .test_update_client import TestUpdateClient
 from .test_validate_client_access import TestValidateClientAccess
 from .test_get_notification_logs import TestGetNotificationLogs
 from .test_mark_log_seen import TestMarkLogSeen
+from .test_get_unread_count import TestGetUnreadCount
+from .test_mark_logs_seen import TestMarkLogsSeen
 
 
 def get_clients_controller_tests():
@@ -18,4 +20,6 @@ def get_clients_controller_tests():
         TestValidateClientAccess,
         TestGetNotificationLogs,
         TestMarkLogSeen,
+        TestGetUnreadCount,
+        TestMarkLogsSeen,
     ]
@@ -1,4 +1,5 @@
 from unittest import TestCase
+from unittest.mock import patch
 from faker import Faker
 
 import frappe
@@ -8,6 +9,8 @@ from frappe_notification import (
     NotificationClientFixtures,
     NotificationOutbox, NotificationOutboxFixtures,
     set_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    insert_recipient_logs
 
 from ..get_notification_logs import get_notification_logs, GetNotificationLogsExecutionArgs
 
@@ -63,6 +66,7 @@ class TestGetNotificationLogs(TestCase):
             for r in d.recipients:
                 r.db_set("status", "Success")
                 r.db_set("time_sent", cls.faker.date_time_this_month())
+            insert_recipient_logs([r.name for r in d.recipients])
 
     @classmethod
     def get_draft_outbox(cls):
@@ -103,7 +107,7 @@ class TestGetNotificationLogs(TestCase):
         self.assertGreater(len(r), 0)
         self.assertCountEqual([
             "subject", "content", "outbox", "outbox_recipient_row", "time_sent",
-            "user_identifier", "seen", "channel", "channel_id", "creation"],
+            "user_identifier", "seen", "channel", "channel_id", "outbox_creation", "name"],
             r[0].keys())
         for log in r:
             self.assertEqual(
@@ -179,6 +183,26 @@ class TestGetNotificationLogs(TestCase):
 
         self.assertEqual(len(r), 2)
 
+    def test_paging_through_logs_of_same_outbox(self):
+        """
+        The logs of an Outbox share its creation, none of them are skipped across the pages
+        """
+        rows = []
+        after = None
+        while True:
+            r = get_notification_logs(GetNotificationLogsExecutionArgs({
+                "first": 1,
+                "after": after,
+                "filters": {"user_identifier": self._USER_ID_1}
+            }))
+            rows.extend(edge.node.outbox_recipient_row for edge in r.edges)
+            if not r.pageInfo.hasNextPage:
+                break
+            after = r.pageInfo.endCursor
+
+        self.assertEqual(len(rows), self.N_FIXTURE_OUTBOXES * 2)
+        self.assertEqual(len(set(rows)), len(rows))
+
     def test_get_logs_with_no_or_partial_args(self):
         """
         get_logs accepts:
@@ -211,3 +235,44 @@ class TestGetNotificationLogs(TestCase):
                 }
             })
             get_notification_logs(args)
+
+    def test_filters_are_parameterized(self):
+        """
+        Quotes in the filters are matched as they are, never as SQL
+        """
+        args = GetNotificationLogsExecutionArgs({
+            "first": 100,
+            "filters": {
+                "user_identifier": f"{self._USER_ID_1}' OR '1'='1"
+            }
+        })
+        r = get_notification_logs(args)
+        self.assertEqual(r.totalCount, 0)
+        self.assertEqual(len(r.edges), 0)
+
+    def test_count_modes(self):
+        """
+        totalCount is cached by default, and could be asked to be exact or skipped
+        """
+        def _get_logs(**kwargs):
+            return get_notification_logs(GetNotificationLogsExecutionArgs({
+                "first": 2,
+                "filters": {"user_identifier": self._USER_ID_2},
+                **kwargs
+            }))
+
+        exact_count = _get_logs(count_mode="exact").totalCount
+        self.assertEqual(exact_count, self.N_FIXTURE_OUTBOXES)
+        self.assertIsNone(_get_logs(count_mode="none").totalCount)
+
+        frappe.cache().delete_keys("cursor_paginator_count:")
+        with patch(
+                "frappe_notification.frappe_notification.controllers.clients.get_notification_logs"
+                ".get_notification_logs_count_resolver", return_value=exact_count) as count_mock:
+            r = _get_logs()
+            self.assertEqual(r.totalCount, exact_count)
+            self.assertEqual(_get_logs(after=r.pageInfo.endCursor).totalCount, exact_count)
+            count_mock.assert_called_once()
+
+        with self.assertRaises(Exception):
+            _get_logs(count_mode="approximate")
@@ -0,0 +1,135 @@
+from unittest import TestCase
+from faker import Faker
+
+import frappe
+from frappe_notification import (
+    NotificationChannelFixtures,
+    NotificationClientFixtures,
+    NotificationClientNotFound,
+    InvalidRequest,
+    NotificationOutbox, NotificationOutboxFixtures,
+    set_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    insert_recipient_logs, mark_recipient_logs_seen
+from frappe_notification.frappe_notification.doctype.notification_recipient_log.\
+    notification_recipient_log import delete_recipient_logs, get_unread_count_key
+from frappe_notification.utils.counters import clear_counters
+
+from ..get_unread_count import get_unread_count
+from ..mark_log_seen import mark_log_seen
+
+
+class TestGetUnreadCount(TestCase):
+    faker = Faker()
+    channels: NotificationChannelFixtures = None
+    clients: NotificationClientFixtures = None
+    outboxes: NotificationOutboxFixtures = None
+
+    N_FIXTURE_OUTBOXES = 3
+    USER_IDENTIFIER = "user-id-1"
+    SMS = "+966 560440266"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.channels = NotificationChannelFixtures()
+        cls.clients = NotificationClientFixtures()
+
+        cls.channels.setUp()
+        cls.clients.setUp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.clients.tearDown()
+        cls.channels.tearDown()
+
+    def setUp(self):
+        self.outboxes = NotificationOutboxFixtures()
+        self.outboxes.setUp()
+        self.client = self.clients.get_non_manager_client().name
+        self.clear_counters()
+
+        set_active_notification_client(None)
+        frappe.set_user("Guest")
+
+    def tearDown(self):
+        set_active_notification_client(None)
+        frappe.set_user("Administrator")
+
+        self.outboxes.tearDown()
+        self.clear_counters()
+
+    def clear_counters(self):
+        clear_counters(
+            get_unread_count_key(self.client, self.USER_IDENTIFIER),
+            get_unread_count_key(
+                self.client, channel=self.channels.get_channel("SMS"), channel_id=self.SMS))
+
+    def make_outbox(self) -> NotificationOutbox:
+        d = NotificationOutbox(dict(
+            doctype="Notification Outbox",
+            notification_client=self.client,
+            subject=self.faker.first_name(),
+            content=self.faker.last_name(),
+            recipients=[
+                dict(
+                    channel=self.channels.get_channel("SMS"),
+                    channel_id=self.SMS, user_identifier=self.USER_IDENTIFIER),
+                dict(
+                    channel=self.channels.get_channel("EMail"),
+                    channel_id="test1@notifications.com", user_identifier=self.USER_IDENTIFIER),
+            ]))
+        d.insert()
+        self.outboxes.add_document(d)
+
+        # Manual submit
+        d.db_set("docstatus", 1)
+        for r in d.recipients:
+            r.db_set("status", "Success")
+        insert_recipient_logs([r.name for r in d.recipients])
+
+        return d
+
+    def test_simple(self):
+        """
+        Counts are built from the logs & kept updated as logs are sent & seen
+        """
+        set_active_notification_client(self.client)
+        sms_channel = self.channels.get_channel("SMS")
+
+        outboxes = [self.make_outbox() for i in range(self.N_FIXTURE_OUTBOXES)]
+        self.assertEqual(
+            get_unread_count(user_identifier=self.USER_IDENTIFIER), self.N_FIXTURE_OUTBOXES * 2)
+        self.assertEqual(
+            get_unread_count(channel=sms_channel, channel_id=self.SMS), self.N_FIXTURE_OUTBOXES)
+
+        # Counters are in redis now, & updated along with the logs
+        outboxes.append(self.make_outbox())
+        mark_log_seen(outbox=outboxes[0].name, outbox_recipient_row=outboxes[0].recipients[0].name)
+        self.assertEqual(get_unread_count(user_identifier=self.USER_IDENTIFIER), 7)
+        self.assertEqual(get_unread_count(channel=sms_channel, channel_id=self.SMS), 3)
+
+        # Already seen logs & logs inserted again are not counted twice
+        self.assertEqual(mark_recipient_logs_seen([outboxes[0].recipients[0].name]), 0)
+        insert_recipient_logs([r.name for r in outboxes[1].recipients])
+        self.assertEqual(get_unread_count(user_identifier=self.USER_IDENTIFIER), 7)
+
+        # Deleted logs are taken off the counts
+        delete_recipient_logs(outboxes[1].name)
+        self.assertEqual(get_unread_count(user_identifier=self.USER_IDENTIFIER), 5)
+        self.assertEqual(get_unread_count(channel=sms_channel, channel_id=self.SMS), 2)
+
+        # Rebuilt from the logs when missing in redis
+        self.clear_counters()
+        self.assertEqual(get_unread_count(user_identifier=self.USER_IDENTIFIER), 5)
+        self.assertEqual(get_unread_count(channel=sms_channel, channel_id=self.SMS), 2)
+
+    def test_invalid_requests(self):
+        with self.assertRaises(NotificationClientNotFound):
+            get_unread_count(user_identifier=self.USER_IDENTIFIER)
+
+        set_active_notification_client(self.client)
+        with self.assertRaises(InvalidRequest):
+            get_unread_count()
+
+        with self.assertRaises(InvalidRequest):
+            get_unread_count(channel=self.channels.get_channel("SMS"))
@@ -9,6 +9,8 @@ from frappe_notification import (
     NotificationClientNotFound,
     NotificationOutbox, NotificationOutboxFixtures,
     set_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    insert_recipient_logs
 
 from ..mark_log_seen import mark_log_seen
 
@@ -65,6 +67,7 @@ class TestMarkLogSeen(TestCase):
             for r in d.recipients:
                 r.db_set("status", "Success")
                 r.db_set("time_sent", self.faker.date_time_this_month())
+            insert_recipient_logs([r.name for r in d.recipients])
 
     def get_draft_outbox(self):
         d = NotificationOutbox(dict(
@@ -107,6 +110,8 @@ class TestMarkLogSeen(TestCase):
         self.assertTrue(t)
         outbox.reload()
         self.assertEqual(outbox.recipients[ROW_IDX].seen, 1)
+        self.assertEqual(frappe.db.get_value(
+            "Notification Recipient Log", outbox.recipients[ROW_IDX].name, "seen"), 1)
 
     def test_with_channel_and_channel_id(self):
         """
@@ -0,0 +1,161 @@
+from unittest import TestCase
+from faker import Faker
+
+import frappe
+from frappe_notification import (
+    NotificationChannelFixtures,
+    NotificationClientFixtures,
+    NotificationClientNotFound,
+    InvalidRequest,
+    NotificationOutbox, NotificationOutboxFixtures,
+    set_active_notification_client)
+from frappe_notification.frappe_notification.doctype.notification_recipient_log import \
+    insert_recipient_logs
+
+from ..get_notification_logs import get_notification_logs, GetNotificationLogsExecutionArgs
+from ..mark_logs_seen import mark_logs_seen
+
+
+class TestMarkLogsSeen(TestCase):
+    faker = Faker()
+    channels: NotificationChannelFixtures = None
+    clients: NotificationClientFixtures = None
+    outboxes: NotificationOutboxFixtures = None
+
+    N_FIXTURE_OUTBOXES = 5
+    SMS_1 = "+966 560440266"
+    SMS_2 = "+966 560440267"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.channels = NotificationChannelFixtures()
+        cls.clients = NotificationClientFixtures()
+
+        cls.channels.setUp()
+        cls.clients.setUp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.clients.tearDown()
+        cls.channels.tearDown()
+
+    def setUp(self):
+        self.outboxes = NotificationOutboxFixtures()
+        self.outboxes.setUp()
+        self.make_bunch_of_outboxes()
+
+        set_active_notification_client(None)
+        frappe.set_user("Guest")
+
+    def tearDown(self):
+        set_active_notification_client(None)
+        frappe.set_user("Administrator")
+
+        self.outboxes.tearDown()
+
+    def make_bunch_of_outboxes(self):
+        for i in range(self.N_FIXTURE_OUTBOXES):
+            d = NotificationOutbox(dict(
+                doctype="Notification Outbox",
+                notification_client=self.clients.get_non_manager_client().name,
+                subject=self.faker.first_name(),
+                content=self.faker.last_name(),
+                recipients=[
+                    dict(
+                        channel=self.channels.get_channel("SMS"),
+                        channel_id=self.SMS_1, user_identifier="user-id-1"),
+                    dict(
+                        channel=self.channels.get_channel("SMS"),
+                        channel_id=self.SMS_2, user_identifier="user-id-2"),
+                ]))
+            d.insert()
+            self.outboxes.add_document(d)
+
+            # Manual submit
+            d.db_set("docstatus", 1)
+            for r in d.recipients:
+                r.db_set("status", "Success")
+            insert_recipient_logs([r.name for r in d.recipients])
+
+    def get_seen(self, outbox: NotificationOutbox):
+        return [
+            (frappe.db.get_value("Notification Recipient Log", x.name, "seen"),
+             frappe.db.get_value("Notification Outbox Recipient Item", x.name, "seen"))
+            for x in outbox.recipients]
+
+    def test_with_outbox_recipient_rows(self):
+        outbox: NotificationOutbox = self.outboxes[0]
+        set_active_notification_client(outbox.notification_client)
+
+        rows = [x.name for x in outbox.recipients]
+        self.assertEqual(mark_logs_seen(outbox_recipient_rows=rows), 2)
+        self.assertEqual(self.get_seen(outbox), [(1, 1), (1, 1)])
+
+        # Seen already
+        self.assertEqual(mark_logs_seen(outbox_recipient_rows=rows), 0)
+
+    def test_with_outboxes(self):
+        set_active_notification_client(self.outboxes[0].notification_client)
+
+        n = mark_logs_seen(
+            outboxes=[self.outboxes[0].name, self.outboxes[1].name],
+            user_identifier="user-id-2")
+        self.assertEqual(n, 2)
+        self.assertEqual(self.get_seen(self.outboxes[0]), [(0, 0), (1, 1)])
+        self.assertEqual(self.get_seen(self.outboxes[1]), [(0, 0), (1, 1)])
+        self.assertEqual(self.get_seen(self.outboxes[2]), [(0, 0), (0, 0)])
+
+        n = mark_logs_seen(
+            outboxes=[self.outboxes[2].name],
+            channel=self.channels.get_channel("SMS"), channel_id=self.SMS_1)
+        self.assertEqual(n, 1)
+        self.assertEqual(self.get_seen(self.outboxes[2]), [(1, 1), (0, 0)])
+
+    def test_with_until_cursor(self):
+        """
+        The log at the cursor & all the ones before it are marked
+        """
+        set_active_notification_client(self.outboxes[0].notification_client)
+
+        # Newest first
+        r = get_notification_logs(GetNotificationLogsExecutionArgs({
+            "first": 2,
+            "filters": {"user_identifier": "user-id-1"}
+        }))
+        edge = r.get("edges")[-1]
+
+        n = mark_logs_seen(until_cursor=edge.get("cursor"), user_identifier="user-id-1")
+        last = self.N_FIXTURE_OUTBOXES - 1
+        self.assertEqual(n, last)
+        self.assertEqual(self.get_seen(self.outboxes[last]), [(0, 0), (0, 0)])
+        for outbox in self.outboxes[:last]:
+            self.assertEqual(self.get_seen(outbox), [(1, 1), (0, 0)])
+
+    def test_logs_of_other_clients(self):
+        outbox: NotificationOutbox = self.outboxes[0]
+        client = outbox.notification_client
+        while client == outbox.notification_client:
+            client = self.faker.random.choice(self.clients).name
+
+        set_active_notification_client(client)
+        self.assertEqual(
+            mark_logs_seen(outbox_recipient_rows=[x.name for x in outbox.recipients]), 0)
+        self.assertEqual(self.get_seen(outbox), [(0, 0), (0, 0)])
+
+    def test_invalid_requests(self):
+        with self.assertRaises(NotificationClientNotFound):
+            mark_logs_seen(outbox_recipient_rows=["random"])
+
+        set_active_notification_client(self.outboxes[0].notification_client)
+        with self.assertRaises(InvalidRequest):
+            mark_logs_seen(user_identifier="user-id-1")
+
+        # A recipient is required
+        with self.assertRaises(InvalidRequest):
+            mark_logs_seen(outboxes=[self.outboxes[0].name])
+
+        with self.assertRaises(InvalidRequest):
+            mark_logs_seen(until_cursor="random", user_identifier="user-id-1")
+
+        with self.assertRaises(InvalidRequest):
+            mark_logs_seen(outbox_recipient_rows="random")
@@ -4,7 +4,8 @@ from .update_template_doc import update_template  # noqa
 from .delete_template_doc import delete_template  # noqa
 from .create_template_doc import create_template  # noqa
 from .fork_template_doc import fork_template  # noqa
-from .send import send_notification  # noqa
+from .send import send_notification, send_notifications_bulk  # noqa
+from .send_chunked import begin_notification, append_notification_recipients, finalize_notification  # noqa
 
 
 from unittest import TestLoader, TestSuite
@@ -17,6 +17,7 @@ def create_template(data: dict) -> NotificationTemplate:
         "subject",
         "content",
         "lang",
+        "priority",
         "allowed_clients",
         "lang_templates",
         "channel_senders"]
@@ -1,34 +1,241 @@
-from typing import List
+from typing import List, Optional
 import frappe
 
 from frappe_notification import (
+    TEMPLATE_KEYS_CACHE_KEY,
+    FrappeNotificationException,
     NotificationTemplate,
     NotificationOutbox,
+    NotificationOutboxStatus,
     NotificationRecipientItem,
     NotificationClientNotFound,
     NotificationTemplateNotFound,
-    get_active_notification_client)
-from .utils import validate_template_access
+    ValidationError,
+    get_active_notification_client,
+    get_active_notification_client_info,
+    get_idempotent_outbox,
+    queue_notifications)
+
+# Max number of sends in a single send_notifications_bulk call
+MAX_BULK_SENDS = 500
+
+# Length of the Data field, Notification Outbox.idempotency_key
+IDEMPOTENCY_KEY_MAX_LENGTH = 140
 
 
 def send_notification(
         template_key: str,
         context: dict,
-        recipients: List[NotificationRecipientItem]) -> NotificationOutbox:
+        recipients: List[NotificationRecipientItem],
+        bulk_insert: Optional[bool] = None,
+        enqueue: bool = False,
+        priority: Optional[str] = None,
+        idempotency_key: Optional[str] = None) -> NotificationOutbox:
     """
     Send out a Notification
     - context.lang could be set to control the language
+    - recipients[].context is overlaid on context, to personalize the notification of a recipient
+    - bulk_insert could be set to control how the Outbox Items are written
+    - enqueue returns a Queued Outbox right away, everything else happens in background
+    - priority (High, Normal, Bulk) overrides the priority of the template
+    - idempotency_key: Sends repeated with the same key return the Outbox of the first one,
+                       without rendering or dispatching again
+    """
+    idempotency_key = idempotency_key or None
+    outbox = _get_idempotent_outbox(idempotency_key)
+    if outbox:
+        return outbox
+
+    # Only the templates the client can read are resolved,
+    # the same rules as validate_template_access(ptype="read")
+    template = get_cached_target_template(key=template_key)
+
+    d: NotificationTemplate = frappe.get_cached_doc("Notification Template", template)
+    if idempotency_key:
+        frappe.db.savepoint("send_notification")
+
+    try:
+        if enqueue:
+            return d.queue_notification(
+                context=context,
+                recipients=recipients,
+                priority=priority,
+                idempotency_key=idempotency_key,
+            )
+
+        return d.send_notification(
+            context=context,
+            recipients=recipients,
+            bulk_insert=bulk_insert,
+            priority=priority,
+            idempotency_key=idempotency_key,
+        )
+    except (frappe.UniqueValidationError, frappe.DuplicateEntryError):
+        # A concurrent send with the same key got in first
+        outbox = _get_idempotent_outbox(idempotency_key, for_update=True)
+        if not outbox:
+            raise
+
+        frappe.db.rollback(save_point="send_notification")
+        return outbox
+
+
+def send_notifications_bulk(sends: List[dict], enqueue: bool = False) -> List[frappe._dict]:
     """
-    template = get_target_template(key=template_key)
+    Send out many Notifications in one go
+    - sends: [{ template_key, context, recipients, priority, idempotency_key }],
+             each like send_notification
+    - Templates are resolved once per key
+    - enqueue writes all the Queued Outboxes together, with multi-row INSERTs,
+      & dispatches them in background. Without it, the sends are made one by one
+
+    A failing send doesn't affect the others. Returns a result per send, in the same order
+    { outbox, status } on success, { error_code, message } otherwise
+    """
+    if not isinstance(sends, list) or not sends:
+        raise ValidationError(frappe._("Please specify the sends"))
+    if len(sends) > MAX_BULK_SENDS:
+        raise ValidationError(
+            frappe._("At most {0} sends are allowed in a single request").format(MAX_BULK_SENDS))
+
+    templates = dict()
+
+    def _get_template(key: str) -> NotificationTemplate:
+        if key not in templates:
+            templates[key] = frappe.get_cached_doc(
+                "Notification Template", get_cached_target_template(key=key))
+        return templates[key]
+
+    def _get_error(e: BaseException) -> frappe._dict:
+        if isinstance(e, FrappeNotificationException):
+            return e.as_dict()
+        return frappe._dict(message=str(e), error_code="UNKNOWN_ERROR")
+
+    results = [None] * len(sends)
+    queued_sends = []
+    # idempotency_key -> index of the send with it, for the sends repeated in the same call
+    idempotency_keys = dict()
+    for i, send in enumerate(sends):
+        send = frappe._dict(send or dict())
+        send.idempotency_key = send.idempotency_key or None
+        if send.idempotency_key and send.idempotency_key in idempotency_keys:
+            results[i] = idempotency_keys[send.idempotency_key]
+            continue
+
+        try:
+            outbox = _get_idempotent_outbox(send.idempotency_key)
+        except BaseException as e:
+            results[i] = _get_error(e)
+            continue
+
+        if outbox:
+            results[i] = frappe._dict(outbox=outbox.name, status=outbox.status)
+            continue
+
+        if send.idempotency_key:
+            idempotency_keys[send.idempotency_key] = i
 
-    # Redundant, but swag :horns:
-    validate_template_access(template=template, ptype="read")
+        if enqueue:
+            try:
+                template = _get_template(send.template_key)
+                queued_sends.append((i, frappe._dict(
+                    template=template,
+                    context=send.context,
+                    recipients=send.recipients,
+                    priority=template.get_priority(send.priority),
+                    idempotency_key=send.idempotency_key,
+                )))
+            except BaseException as e:
+                results[i] = _get_error(e)
+            continue
+
+        frappe.db.savepoint("send_notifications_bulk")
+        try:
+            outbox = _get_template(send.template_key).send_notification(
+                context=send.context or dict(),
+                recipients=send.recipients or [],
+                priority=send.priority,
+                idempotency_key=send.idempotency_key,
+            )
+        except BaseException as e:
+            frappe.db.rollback(save_point="send_notifications_bulk")
+            # A concurrent send with the same key got in first
+            outbox = _get_idempotent_outbox(send.idempotency_key, for_update=True) \
+                if _is_duplicate_entry(e) else None
+            if not outbox:
+                results[i] = _get_error(e)
+                continue
+
+        results[i] = frappe._dict(outbox=outbox.name, status=outbox.status)
+
+    if queued_sends:
+        frappe.db.savepoint("send_notifications_bulk")
+        try:
+            outboxes = queue_notifications([x[1] for x in queued_sends])
+            for (i, _), outbox in zip(queued_sends, outboxes):
+                results[i] = frappe._dict(
+                    outbox=outbox, status=NotificationOutboxStatus.QUEUED.value)
+        except BaseException as bulk_error:
+            if not _is_duplicate_entry(bulk_error):
+                raise
+
+            # A key got taken by a concurrent send since it was checked, failing all of the
+            # multi-row INSERT. The sends are queued one by one instead, like send_notification
+            frappe.db.rollback(save_point="send_notifications_bulk")
+            for i, send in queued_sends:
+                frappe.db.savepoint("send_notifications_bulk")
+                try:
+                    outbox = send.template.queue_notification(
+                        context=send.context,
+                        recipients=send.recipients,
+                        priority=send.priority,
+                        idempotency_key=send.idempotency_key,
+                    )
+                except BaseException as e:
+                    frappe.db.rollback(save_point="send_notifications_bulk")
+                    outbox = _get_idempotent_outbox(send.idempotency_key, for_update=True) \
+                        if _is_duplicate_entry(e) else None
+                    if not outbox:
+                        results[i] = _get_error(e)
+                        continue
+
+                results[i] = frappe._dict(outbox=outbox.name, status=outbox.status)
+
+    # Repeated sends get the result of the first one
+    return [results[x] if isinstance(x, int) else x for x in results]
+
+
+def _is_duplicate_entry(e: BaseException) -> bool:
+    # Multi-row INSERTs raise the error of the db driver, not the one of the ORM
+    return isinstance(e, (frappe.UniqueValidationError, frappe.DuplicateEntryError)) \
+        or frappe.db.is_duplicate_entry(e)
+
+
+def _get_idempotent_outbox(
+        idempotency_key: Optional[str], for_update: bool = False) -> Optional[NotificationOutbox]:
+    if not idempotency_key:
+        return None
+
+    if not isinstance(idempotency_key, str) or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValidationError(
+            frappe._("Idempotency Key should be a string of at most {0} characters").format(
+                IDEMPOTENCY_KEY_MAX_LENGTH))
+
+    return get_idempotent_outbox(
+        get_active_notification_client(), idempotency_key, for_update=for_update)
+
+
+def get_cached_target_template(key: str, client: str = None) -> str:
+    """
+    get_target_template, cached by (client, key) till a template or a client changes
+    """
+    client = client or get_active_notification_client()
+    if not client:
+        raise NotificationClientNotFound()
 
-    d: NotificationTemplate = frappe.get_doc("Notification Template", template)
-    return d.send_notification(
-        context=context,
-        recipients=recipients,
-    )
+    return frappe.cache().hget(
+        TEMPLATE_KEYS_CACHE_KEY, f"{client}:{key}",
+        generator=lambda: get_target_template(key=key, client=client))
 
 
 def get_target_template(key: str, client: str = None) -> str:
@@ -52,7 +259,10 @@ def get_target_template(key: str, client: str = None) -> str:
         return t
 
     # Search Templates that the manager of active client has defined
-    manager = frappe.db.get_value("Notification Client", client, "managed_by")
+    if client == get_active_notification_client():
+        manager = get_active_notification_client_info().managed_by
+    else:
+        manager = frappe.db.get_value("Notification Client", client, "managed_by")
     manager_template = _get_template_created_by(_client=manager)
 
     # Verify active client in Allowed Clients
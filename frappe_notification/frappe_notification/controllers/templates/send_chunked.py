@@ -0,0 +1,85 @@
+from typing import List, Optional
+import frappe
+
+from frappe_notification import (
+    NotificationTemplate,
+    NotificationOutbox,
+    NotificationOutboxNotFound,
+    NotificationRecipientItem,
+    get_active_notification_client,
+    get_outbox_without_recipients)
+
+from .send import _get_idempotent_outbox, get_cached_target_template
+
+
+def begin_notification(
+        template_key: str,
+        context: dict,
+        priority: Optional[str] = None,
+        idempotency_key: Optional[str] = None) -> NotificationOutbox:
+    """
+    Start a Notification with a very large number of recipients
+    Returns a Draft Outbox. Its recipients are appended in chunks with
+    append_notification_recipients & it is sent out with finalize_notification
+
+    Args are the same as send_notification
+    Draft Outboxes not finalized within DRAFT_OUTBOX_RETENTION are deleted
+    """
+    idempotency_key = idempotency_key or None
+    outbox = _get_idempotent_outbox(idempotency_key)
+    if outbox:
+        return outbox
+
+    template = get_cached_target_template(key=template_key)
+
+    d: NotificationTemplate = frappe.get_cached_doc("Notification Template", template)
+    if idempotency_key:
+        frappe.db.savepoint("begin_notification")
+
+    try:
+        return d.begin_notification(
+            context=context or dict(),
+            priority=priority,
+            idempotency_key=idempotency_key,
+        )
+    except (frappe.UniqueValidationError, frappe.DuplicateEntryError):
+        # A concurrent begin with the same key got in first
+        outbox = _get_idempotent_outbox(idempotency_key, for_update=True)
+        if not outbox:
+            raise
+
+        frappe.db.rollback(save_point="begin_notification")
+        return outbox
+
+
+def append_notification_recipients(outbox: str, recipients: List[NotificationRecipientItem]):
+    """
+    Validate & write a chunk of recipients to the Draft Outbox
+    Nothing is written when any one of the recipients is invalid
+    """
+    outbox = _get_draft_outbox(outbox)
+
+    d: NotificationTemplate = frappe.get_cached_doc(
+        "Notification Template", outbox.notification_template)
+    d.append_notification_recipients(outbox=outbox, recipients=recipients or [])
+
+    return outbox
+
+
+def finalize_notification(outbox: str) -> NotificationOutbox:
+    """
+    Submit the Draft Outbox. Its recipients are dispatched in background
+    """
+    outbox = _get_draft_outbox(outbox)
+    outbox.finalize()
+
+    return outbox
+
+
+def _get_draft_outbox(outbox: str) -> NotificationOutbox:
+    # Locked, so that the appends & finalize of the same Outbox happen one after the other
+    d = get_outbox_without_recipients(outbox, for_update=True)
+    if d.notification_client != get_active_notification_client():
+        raise NotificationOutboxNotFound(outbox=outbox)
+
+    return d
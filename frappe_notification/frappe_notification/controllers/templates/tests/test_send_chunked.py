@@ -0,0 +1,210 @@
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_to_date
+
+from frappe_notification import (
+    NotificationOutbox,
+    NotificationOutboxStatus,
+    NotificationChannelFixtures,
+    NotificationClientFixtures,
+    NotificationTemplateFixtures,
+    NotificationOutboxFixtures,
+    NotificationOutboxNotFound,
+    NotificationChannelNotFound,
+    ValidationError,
+    get_idempotent_outbox,
+    set_active_notification_client,
+)
+
+from frappe_notification.frappe_notification.doctype.notification_outbox import (
+    DRAFT_OUTBOX_RETENTION, delete_stale_draft_outboxes, dispatch_outbox_in_chunks)
+
+from ..send_chunked import (
+    begin_notification, append_notification_recipients, finalize_notification)
+from .test_send_notification import _get_template_created_by
+
+
+class TestSendChunked(unittest.TestCase):
+    channels: NotificationChannelFixtures = None
+    clients: NotificationClientFixtures = None
+    templates: NotificationTemplateFixtures = None
+    outboxes: NotificationOutboxFixtures = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.channels = NotificationChannelFixtures()
+        cls.clients = NotificationClientFixtures()
+        cls.templates = NotificationTemplateFixtures()
+
+        cls.channels.setUp()
+        cls.clients.setUp()
+        cls.templates.setUp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.templates.tearDown()
+        cls.clients.tearDown()
+        cls.channels.tearDown()
+
+    def setUp(self):
+        self.outboxes = NotificationOutboxFixtures()
+        self.outboxes.setUp()
+
+        frappe.set_user("Guest")
+        set_active_notification_client(None)
+
+    def tearDown(self) -> None:
+        frappe.set_user("Administrator")
+        set_active_notification_client(None)
+
+        self.outboxes.tearDown()
+
+    def test_simple(self):
+        """
+        Recipients appended in chunks get sent out once finalized
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        outbox = begin_notification(template_key=template.key, context=dict(otp=2233))
+        self.outboxes.add_document(outbox)
+        self.assertEqual(NotificationOutboxStatus(outbox.status), NotificationOutboxStatus.DRAFT)
+        self.assertEqual(
+            outbox.get_content().subject, template.subject.replace("{{ otp }}", "2233"))
+
+        with patch.object(NotificationOutbox, "BULK_INSERT_CHUNK_SIZE", 2):
+            for i in range(3):
+                append_notification_recipients(outbox.name, recipients=[
+                    dict(channel=sms_channel, channel_id=f"+966 56044026{i}", user_identifier=i),
+                    dict(channel=sms_channel, channel_id=f"+966 56044027{i}",
+                         context=dict(otp=i)),
+                    dict(channel=sms_channel, channel_id=f"+966 56044028{i}"),
+                ])
+
+        self.assertEqual(frappe.db.get_value("Notification Outbox", outbox.name, "docstatus"), 0)
+
+        with patch.object(NotificationOutbox, "DISPATCH_CHUNK_SIZE", 4), \
+                patch.object(NotificationOutbox, "send_pending_notifications") as send_mock:
+            finalize_notification(outbox.name)
+            self.assertEqual(send_mock.call_count, 3)
+
+        outbox.reload()
+        self.assertEqual(outbox.docstatus, 1)
+        self.assertEqual(NotificationOutboxStatus(outbox.status), NotificationOutboxStatus.PENDING)
+        self.assertEqual(outbox.pending_count, 9)
+        self.assertIsNone(outbox.queued_args)
+        self.assertEqual([x.idx for x in outbox.recipients], list(range(1, 10)))
+        self.assertEqual({x.docstatus for x in outbox.recipients}, {1})
+        self.assertEqual(outbox.recipients[3].channel_id, "+966 560440261")
+
+        # Personalized recipients get the templates rendered with their context
+        self.assertEqual(
+            frappe.get_doc("Notification Content", outbox.recipients[4].content_hash).subject,
+            template.subject.replace("{{ otp }}", "1"))
+
+        # Running the jobs again dispatches nothing twice
+        with patch.object(NotificationOutbox, "send_pending_notifications") as send_mock:
+            dispatch_outbox_in_chunks(outbox.name)
+            send_mock.assert_not_called()
+
+        # Not a Draft anymore
+        with self.assertRaises(ValidationError):
+            finalize_notification(outbox.name)
+
+    def test_append_errors(self):
+        """
+        Invalid chunks are not written
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        outbox = begin_notification(template_key=template.key, context=dict(otp=2233))
+        self.outboxes.add_document(outbox)
+
+        with self.assertRaises(NotificationChannelNotFound):
+            append_notification_recipients(outbox.name, recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440261"),
+                dict(channel="non-existent-channel", channel_id="random"),
+            ])
+
+        with self.assertRaises(ValidationError):
+            append_notification_recipients(outbox.name, recipients=[])
+
+        # Nothing to send yet
+        with self.assertRaises(ValidationError):
+            finalize_notification(outbox.name)
+
+        self.assertEqual(frappe.db.count(
+            "Notification Outbox Recipient Item", dict(parent=outbox.name)), 0)
+
+        # Outboxes of the other clients are not found
+        set_active_notification_client(self.clients.get_non_manager_client().name)
+        with self.assertRaises(NotificationOutboxNotFound):
+            append_notification_recipients(outbox.name, recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440261")])
+
+    def test_idempotency_key(self):
+        """
+        A concurrent begin with the same key gets the Outbox of the one that got in first
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        idempotency_key = frappe.generate_hash(length=20)
+
+        outbox = begin_notification(
+            template_key=template.key, context=dict(otp=2233), idempotency_key=idempotency_key)
+        self.outboxes.add_document(outbox)
+
+        # The concurrent begin is not seen till the INSERT fails
+        with patch(
+                "frappe_notification.frappe_notification.controllers.templates.send."
+                "get_idempotent_outbox",
+                side_effect=lambda client, key, for_update=False:
+                get_idempotent_outbox(client, key, for_update) if for_update else None):
+            self.assertEqual(begin_notification(
+                template_key=template.key, context=dict(otp=2233),
+                idempotency_key=idempotency_key).name, outbox.name)
+
+        # Empty keys are not kept
+        outbox = begin_notification(
+            template_key=template.key, context=dict(otp=2233), idempotency_key="")
+        self.outboxes.add_document(outbox)
+        self.assertIsNone(
+            frappe.db.get_value("Notification Outbox", outbox.name, "idempotency_key"))
+
+    def test_delete_stale_draft_outboxes(self):
+        """
+        Drafts not finalized in time are deleted along with their Items
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        stale, recent = [
+            begin_notification(template_key=template.key, context=dict(otp=2233))
+            for i in range(2)]
+        self.outboxes.add_document(recent)
+        append_notification_recipients(stale.name, recipients=[
+            dict(channel=sms_channel, channel_id="+966 560440261")])
+        frappe.db.set_value(
+            "Notification Outbox", stale.name, "creation",
+            add_to_date(None, seconds=-DRAFT_OUTBOX_RETENTION - 1))
+
+        delete_stale_draft_outboxes()
+
+        self.assertFalse(frappe.db.exists("Notification Outbox", stale.name))
+        self.assertEqual(frappe.db.count(
+            "Notification Outbox Recipient Item", dict(parent=stale.name)), 0)
+        self.assertTrue(frappe.db.exists("Notification Outbox", recent.name))
@@ -1,19 +1,28 @@
 import unittest
+from unittest.mock import patch
 
 import frappe
+from frappe.utils import add_to_date
 
 from frappe_notification import (
     NotificationTemplate,
     NotificationOutbox,
+    NotificationOutboxStatus,
     NotificationChannelFixtures,
     NotificationClientFixtures,
     NotificationTemplateFixtures,
     NotificationOutboxFixtures,
     NotificationTemplateNotFound,
+    NotificationPriority,
+    ValidationError,
     set_active_notification_client,
+    clear_template_key_cache,
 )
+from frappe_notification.frappe_notification.doctype.notification_outbox import (
+    IDEMPOTENCY_KEY_RETENTION)
 
-from ..send import send_notification, get_target_template
+from ..send import (
+    send_notification, send_notifications_bulk, get_target_template, get_cached_target_template)
 
 
 class TestSendNotification(unittest.TestCase):
@@ -88,6 +97,351 @@ class TestSendNotification(unittest.TestCase):
 
         self.assertEqual(outbox.notification_client, manager)
 
+    def test_bulk_insert(self):
+        """
+        Outbox Items written in bulk should be the same as the ones inserted one by one
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+
+        sms_channel = self.channels.get_channel("sms")
+        recipients = [
+            dict(channel=sms_channel, channel_id=f"+966 5604402{i:02}", user_identifier=f"id-{i}")
+            for i in range(25)
+        ]
+
+        outbox = send_notification(
+            template_key=template.key,
+            context=dict(otp=2233),
+            recipients=recipients,
+            bulk_insert=True,
+        )
+        self.assertIsInstance(outbox, NotificationOutbox)
+        self.outboxes.add_document(outbox)
+
+        self.assertEqual(outbox.docstatus, 1)
+        self.assertEqual(outbox.pending_count, len(recipients))
+
+        outbox.reload()
+        self.assertCountEqual(
+            [
+                (x.get("channel"), x.get("channel_id"), x.get("user_identifier"))
+                for x in recipients
+            ],
+            [
+                (x.get("channel"), x.get("channel_id"), x.get("user_identifier"))
+                for x in outbox.recipients
+            ],
+        )
+
+    def test_priority(self):
+        """
+        Outbox priority falls back to the one on the template
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        recipients = [dict(channel=self.channels.get_channel("sms"), channel_id="+966 560440266")]
+
+        outbox = send_notification(
+            template_key=template.key, context=dict(), recipients=recipients)
+        self.outboxes.add_document(outbox)
+        self.assertEqual(
+            NotificationPriority(outbox.priority),
+            NotificationPriority(template.priority or NotificationPriority.NORMAL.value))
+
+        outbox = send_notification(
+            template_key=template.key, context=dict(), recipients=recipients,
+            priority=NotificationPriority.HIGH.value)
+        self.outboxes.add_document(outbox)
+        self.assertEqual(NotificationPriority(outbox.priority), NotificationPriority.HIGH)
+        self.assertEqual(outbox.get_dispatch_queue(frappe._dict(queue="sms")), "short")
+
+        with self.assertRaises(ValidationError):
+            send_notification(
+                template_key=template.key, context=dict(), recipients=recipients,
+                priority="Urgent")
+
+    def test_enqueue(self):
+        """
+        A Queued Outbox is returned & gets submitted in the background
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+
+        sms_channel = self.channels.get_channel("sms")
+        recipients = [
+            dict(channel=sms_channel, channel_id="+966 560440266", user_identifier="id-1"),
+            dict(channel=sms_channel, channel_id="+966 560440267", user_identifier="id-2"),
+        ]
+
+        outbox = send_notification(
+            template_key=template.key,
+            context=dict(otp=2233),
+            recipients=recipients,
+            enqueue=True,
+        )
+        self.outboxes.add_document(outbox)
+
+        self.assertEqual(NotificationOutboxStatus(outbox.status), NotificationOutboxStatus.QUEUED)
+        self.assertEqual(outbox.notification_template, template.name)
+
+        # Background job runs right away in tests
+        outbox.reload()
+        self.assertEqual(outbox.docstatus, 1)
+        self.assertIsNone(outbox.queued_args)
+        self.assertEqual(
+            outbox.get_content().subject, template.subject.replace("{{ otp }}", "2233"))
+        self.assertEqual(len(outbox.recipients), len(recipients))
+
+    def test_enqueue_with_errors(self):
+        """
+        Errors in the background job are recorded on the Outbox
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+
+        outbox = send_notification(
+            template_key=template.key,
+            context=dict(otp=2233),
+            recipients=[dict(channel="non-existent-channel", channel_id="random")],
+            enqueue=True,
+        )
+        self.outboxes.add_document(outbox)
+
+        outbox.reload()
+        self.assertEqual(outbox.docstatus, 0)
+        self.assertEqual(NotificationOutboxStatus(outbox.status), NotificationOutboxStatus.FAILED)
+        self.assertEqual(
+            frappe.parse_json(outbox.error).error_code, "NOTIFICATION_CHANNEL_NOT_FOUND")
+
+    def test_idempotency_key(self):
+        """
+        Sends repeated with the same key get the Outbox of the first one
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+        idempotency_key = frappe.generate_hash(length=20)
+
+        def _send(**kwargs):
+            return send_notification(
+                template_key=template.key,
+                context=dict(otp=2233),
+                recipients=[dict(channel=sms_channel, channel_id="+966 560440266")],
+                idempotency_key=idempotency_key,
+                **kwargs)
+
+        outbox = _send()
+        self.outboxes.add_document(outbox)
+        self.assertEqual(outbox.idempotency_key, idempotency_key)
+
+        with patch.object(NotificationTemplate, "send_notification") as send_mock:
+            self.assertEqual(_send().name, outbox.name)
+            self.assertEqual(_send(enqueue=True).name, outbox.name)
+            send_mock.assert_not_called()
+
+        # The key is released once expired
+        frappe.db.set_value(
+            "Notification Outbox", outbox.name, "creation",
+            add_to_date(outbox.creation, seconds=-IDEMPOTENCY_KEY_RETENTION - 1))
+        new_outbox = _send()
+        self.outboxes.add_document(new_outbox)
+        self.assertNotEqual(new_outbox.name, outbox.name)
+        self.assertIsNone(frappe.db.get_value(
+            "Notification Outbox", outbox.name, "idempotency_key"))
+
+        with self.assertRaises(ValidationError):
+            send_notification(
+                template_key=template.key, context=dict(), recipients=[],
+                idempotency_key="x" * 141)
+
+    def test_empty_idempotency_key(self):
+        """
+        Empty keys are not kept, & do not collide with each other
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        names = []
+        for i in range(2):
+            outbox = send_notification(
+                template_key=template.key, context=dict(otp=2233), enqueue=True,
+                recipients=[dict(channel=sms_channel, channel_id="+966 560440266")],
+                idempotency_key="")
+            self.outboxes.add_document(outbox)
+            names.append(outbox.name)
+
+        self.assertNotEqual(names[0], names[1])
+        for name in names:
+            self.assertIsNone(frappe.db.get_value("Notification Outbox", name, "idempotency_key"))
+
+    def test_send_notifications_bulk_enqueue_key_conflict(self):
+        """
+        A key taken by a concurrent send fails only its own send
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+        recipients = [dict(channel=sms_channel, channel_id="+966 560440266")]
+        idempotency_key = frappe.generate_hash(length=20)
+
+        outbox = send_notification(
+            template_key=template.key, context=dict(otp=1), recipients=recipients,
+            idempotency_key=idempotency_key)
+        self.outboxes.add_document(outbox)
+
+        from frappe_notification import get_idempotent_outbox
+
+        # The concurrent send is not seen till the INSERT fails
+        with patch(
+                "frappe_notification.frappe_notification.controllers.templates.send."
+                "get_idempotent_outbox",
+                side_effect=lambda client, key, for_update=False:
+                get_idempotent_outbox(client, key, for_update) if for_update else None):
+            results = send_notifications_bulk(enqueue=True, sends=[
+                dict(template_key=template.key, context=dict(otp=2), recipients=recipients,
+                     idempotency_key=idempotency_key),
+                dict(template_key=template.key, context=dict(otp=3), recipients=recipients),
+            ])
+
+        self.assertEqual(results[0].outbox, outbox.name)
+        self.outboxes.add_document(frappe.get_doc("Notification Outbox", results[1].outbox))
+        self.assertEqual(
+            NotificationOutboxStatus(results[1].status), NotificationOutboxStatus.QUEUED)
+
+    def test_send_notifications_bulk_key_conflict(self):
+        """
+        A key taken by a concurrent send returns its Outbox, without enqueue too
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+        recipients = [dict(channel=sms_channel, channel_id="+966 560440266")]
+        idempotency_key = frappe.generate_hash(length=20)
+
+        outbox = send_notification(
+            template_key=template.key, context=dict(otp=1), recipients=recipients,
+            idempotency_key=idempotency_key)
+        self.outboxes.add_document(outbox)
+
+        from frappe_notification import get_idempotent_outbox
+
+        # The concurrent send is not seen till the INSERT fails
+        with patch(
+                "frappe_notification.frappe_notification.controllers.templates.send."
+                "get_idempotent_outbox",
+                side_effect=lambda client, key, for_update=False:
+                get_idempotent_outbox(client, key, for_update) if for_update else None):
+            results = send_notifications_bulk(sends=[
+                dict(template_key=template.key, context=dict(otp=2), recipients=recipients,
+                     idempotency_key=idempotency_key),
+                dict(template_key=template.key, context=dict(otp=3), recipients=recipients),
+            ])
+
+        self.assertEqual(results[0].outbox, outbox.name)
+        self.assertEqual(results[0].status, outbox.status)
+        other_outbox = frappe.get_doc("Notification Outbox", results[1].outbox)
+        self.outboxes.add_document(other_outbox)
+        self.assertEqual(other_outbox.docstatus, 1)
+
+    def test_send_notifications_bulk(self):
+        """
+        Each send gets its own Outbox or error, in order
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        results = send_notifications_bulk(sends=[
+            dict(template_key=template.key, context=dict(otp=1), recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440266")]),
+            dict(template_key=frappe.generate_hash(length=12), context=dict(), recipients=[]),
+            dict(template_key=template.key, context=dict(otp=2), recipients=[
+                dict(channel="non-existent-channel", channel_id="random")]),
+            dict(template_key=template.key, context=dict(otp=3), priority="High", recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440267")]),
+        ])
+        self.assertEqual(len(results), 4)
+
+        self.assertEqual(results[1].error_code, "NOTIFICATION_TEMPLATE_NOT_FOUND")
+        self.assertEqual(results[2].error_code, "NOTIFICATION_CHANNEL_NOT_FOUND")
+
+        for r, otp in ((results[0], "1"), (results[3], "3")):
+            outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", r.outbox)
+            self.outboxes.add_document(outbox)
+            self.assertEqual(outbox.docstatus, 1)
+            self.assertEqual(
+                outbox.get_content().subject, template.subject.replace("{{ otp }}", otp))
+
+        self.assertEqual(frappe.db.get_value(
+            "Notification Outbox", results[3].outbox, "priority"), NotificationPriority.HIGH.value)
+
+        with self.assertRaises(ValidationError):
+            send_notifications_bulk(sends=[])
+
+        # Repeated keys, in the same call & across calls
+        idempotency_key = frappe.generate_hash(length=20)
+        send = dict(
+            template_key=template.key, context=dict(otp=4), idempotency_key=idempotency_key,
+            recipients=[dict(channel=sms_channel, channel_id="+966 560440268")])
+        results = send_notifications_bulk(sends=[send, send])
+        self.outboxes.add_document(frappe.get_doc("Notification Outbox", results[0].outbox))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(send_notifications_bulk(sends=[send])[0].outbox, results[0].outbox)
+
+    def test_send_notifications_bulk_enqueue(self):
+        """
+        Queued Outboxes are written together & submitted in background
+        """
+        manager = self.clients.get_manager_client().name
+        set_active_notification_client(manager)
+
+        template = _get_template_created_by(self.templates, manager)
+        sms_channel = self.channels.get_channel("sms")
+
+        results = send_notifications_bulk(enqueue=True, sends=[
+            dict(template_key=template.key, context=dict(otp=1), recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440266")]),
+            dict(template_key=template.key, context=dict(otp=2), priority="Urgent",
+                 recipients=[dict(channel=sms_channel, channel_id="+966 560440266")]),
+            dict(template_key=template.key, context=dict(otp=3), recipients=[
+                dict(channel=sms_channel, channel_id="+966 560440267")]),
+        ])
+
+        self.assertEqual(results[1].error_code, "VALIDATION_ERROR")
+        for r, otp in ((results[0], "1"), (results[2], "3")):
+            self.assertEqual(
+                NotificationOutboxStatus(r.status), NotificationOutboxStatus.QUEUED)
+
+            # Background job runs right away in tests
+            outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", r.outbox)
+            self.outboxes.add_document(outbox)
+            self.assertEqual(outbox.docstatus, 1)
+            self.assertEqual(outbox.notification_client, manager)
+            self.assertEqual(outbox.notification_template, template.name)
+            self.assertEqual(
+                outbox.get_content().subject, template.subject.replace("{{ otp }}", otp))
+            self.assertEqual(len(outbox.recipients), 1)
+
 
 class TestGetTargetTemplate(unittest.TestCase):
     clients = NotificationClientFixtures()
@@ -186,6 +540,31 @@ class TestGetTargetTemplate(unittest.TestCase):
         with self.assertRaises(NotificationTemplateNotFound):
             get_target_template(key=manager_2_template.key)
 
+    def test_cached_target_template(self):
+        """
+        Resolved keys are cached per client, till a template is updated
+        """
+        manager = self.clients.get_manager_client().name
+        template = _get_template_created_by(self.templates, manager)
+        client = self.clients.get_clients_managed_by(manager)[0].name
+        set_active_notification_client(client)
+        clear_template_key_cache()
+
+        self.assertEqual(get_cached_target_template(key=template.key), template.name)
+        with patch("frappe_notification.frappe_notification.controllers.templates.send"
+                   ".get_target_template") as get_target_template_mock:
+            self.assertEqual(get_cached_target_template(key=template.key), template.name)
+            get_target_template_mock.assert_not_called()
+
+        # Forking inserts a template, the key resolves to the fork now
+        forked_template = template.fork()
+        self.templates.add_document(forked_template)
+        self.assertEqual(get_cached_target_template(key=template.key), forked_template.name)
+
+        # Missing templates are not cached
+        with self.assertRaises(NotificationTemplateNotFound):
+            get_cached_target_template(key=frappe.generate_hash(length=12))
+
 
 def _get_template_created_by(
         template_fixtures: NotificationTemplateFixtures,
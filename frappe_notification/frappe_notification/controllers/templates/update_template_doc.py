@@ -11,7 +11,8 @@ def update_template(template: str, data: dict):
 
     validate_template_access(template=template, ptype="update")
 
-    _fields = ["subject", "content", "lang", "allowed_clients", "lang_templates", "channel_senders"]
+    _fields = ["subject", "content", "lang", "priority", "allowed_clients", "lang_templates",
+               "channel_senders"]
     data = frappe._dict({
         k: data.get(k)
         for k in _fields
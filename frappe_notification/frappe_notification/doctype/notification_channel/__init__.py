@@ -1,2 +1,2 @@
-from .notification_channel import NotificationChannel  # noqa
+from .notification_channel import NotificationChannel, acquire_send_token, clear_channel_cache, clear_channel_registry, get_channel_config, get_channel_configs, get_channel_registry  # noqa
 from .test_notification_channel import NotificationChannelFixtures  # noqa
@@ -1,12 +1,123 @@
 # Copyright (c) 2022, Leam Technology Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
+from typing import Dict, List, Optional, Tuple
+
+import frappe
 from frappe.model.document import Document
 
+from frappe_notification.utils.throttle import rate_limit
+
+# Snapshot of the settings of all the channels, in redis
+CHANNEL_CONFIGS_KEY = "frappe_notification:channel_configs"
+
+CHANNEL_CONFIG_FIELDS = [
+    "name", "enabled", "sender_type", "default_sender", "batch_recipients", "batch_recipients_size",
+    "queue", "max_concurrent_jobs", "max_attempts", "retry_backoff"]
+
+# Version of the channel registries. Changing it drops the registries of all the processes
+CHANNEL_REGISTRY_VERSION_KEY = "frappe_notification:channel_registry_version"
+
+# Channel registry of the process, per site
+_channel_registries: Dict[str, frappe._dict] = dict()
+
 
 class NotificationChannel(Document):
     enabled: int
     title: str
     sender_type: str
     default_sender: str
+    batch_recipients: int
+    batch_recipients_size: int
+    queue: str
+    max_concurrent_jobs: int
+    rate_limit: float
+    rate_limit_burst: int
+    sender_rate_limits: List[dict]
+    max_attempts: int
+    retry_backoff: int
+
+    def get_rate_limit(
+            self, sender_type: Optional[str], sender: Optional[str]) -> Tuple[float, int]:
+        """
+        Returns the (rate, burst) the sender is allowed to send notifications at
+        """
+        for row in self.sender_rate_limits:
+            if row.sender_type == sender_type and row.sender == sender:
+                return row.rate_limit, row.rate_limit_burst
+
+        return self.rate_limit, self.rate_limit_burst
+
+    def on_update(self):
+        clear_channel_cache()
+
+    def on_trash(self):
+        clear_channel_cache()
+
+
+def acquire_send_token(channel: str, sender_type: Optional[str], sender: Optional[str]):
+    """
+    To be called by Channel Handlers before sending out a notification
+    Waits till the sender is within the Rate Limit of the channel, for a few seconds at the most.
+    Raises RateLimitExceeded otherwise. The handlers are expected to defer their recipients then,
+    with defer_outbox_recipients, instead of failing them
+    """
+    rate, burst = frappe.get_cached_doc("Notification Channel", channel).get_rate_limit(
+        sender_type, sender)
+    if not rate:
+        return
+
+    rate_limit(f"notification_channel:{channel}:{sender_type}:{sender}", rate=rate, burst=burst)
+
+
+def get_channel_configs() -> Dict[str, frappe._dict]:
+    """
+    Settings of all the Notification Channels, by name. Loaded once & kept in redis
+    till a channel changes. Please do not modify the values returned
+    """
+    return frappe.cache().get_value(CHANNEL_CONFIGS_KEY, generator=_get_channel_configs)
+
+
+def get_channel_config(channel: str) -> Optional[frappe._dict]:
+    """
+    Settings of the channel, None if there is no such channel
+    """
+    return get_channel_configs().get(channel)
+
+
+def _get_channel_configs() -> Dict[str, frappe._dict]:
+    return {
+        x.name: x
+        for x in frappe.get_all("Notification Channel", fields=CHANNEL_CONFIG_FIELDS)
+    }
+
+
+def clear_channel_cache():
+    """
+    Drops everything cached about the channels
+    Called on Notification Channel updates & on frappe.clear_cache, which covers hook changes
+    """
+    frappe.cache().delete_value(CHANNEL_CONFIGS_KEY)
+    clear_channel_registry()
+
+
+def get_channel_registry() -> frappe._dict:
+    """
+    Registry of the process, holding what has been resolved for the channels of the site,
+    like their handlers. It is kept till the channels or the hooks change
+    """
+    site = frappe.local.site
+    version = frappe.cache().get_value(CHANNEL_REGISTRY_VERSION_KEY)
+    registry = _channel_registries.get(site)
+    if registry is None or registry.version != version:
+        registry = _channel_registries[site] = frappe._dict(version=version)
+
+    return registry
+
+
+def clear_channel_registry():
+    """
+    Drops the channel registries of the site, in all the processes
+    """
+    frappe.cache().set_value(CHANNEL_REGISTRY_VERSION_KEY, frappe.generate_hash(length=10))
+    _channel_registries.pop(frappe.local.site, None)
@@ -3,9 +3,12 @@
 
 import frappe
 import unittest
+from unittest.mock import patch
 
 from frappe_testing import TestFixture
 
+from .notification_channel import clear_channel_cache, get_channel_config, get_channel_configs
+
 
 class NotificationChannelFixtures(TestFixture):
     already_existing_channels = []
@@ -44,4 +47,86 @@ class NotificationChannelFixtures(TestFixture):
 
 
 class TestNotificationChannel(unittest.TestCase):
-    pass
+    def test_get_rate_limit(self):
+        channel = frappe.get_doc(dict(
+            doctype="Notification Channel", title="Test Channel",
+            rate_limit=10, rate_limit_burst=20,
+            sender_rate_limits=[
+                dict(sender_type="Email Account", sender="Test Account", rate_limit=2),
+            ]))
+
+        self.assertEqual(channel.get_rate_limit("Email Account", "Test Account"), (2, None))
+        self.assertEqual(channel.get_rate_limit("Email Account", "Other Account"), (10, 20))
+        self.assertEqual(channel.get_rate_limit(None, None), (10, 20))
+
+    def test_get_channel_configs(self):
+        channels = NotificationChannelFixtures()
+        channels.setUp()
+        self.addCleanup(channels.tearDown)
+
+        sms_channel = frappe.get_doc("Notification Channel", channels.get_channel("SMS"))
+        configs = get_channel_configs()
+        self.assertIn(sms_channel.name, configs)
+        self.assertEqual(configs[sms_channel.name].enabled, sms_channel.enabled)
+
+        # Served from the cache
+        with patch("frappe.get_all") as get_all:
+            get_channel_configs()
+            get_all.assert_not_called()
+
+        # Dropped on save
+        batch_recipients = sms_channel.batch_recipients
+
+        def _restore():
+            frappe.db.set_value(
+                "Notification Channel", sms_channel.name, "batch_recipients", batch_recipients)
+            clear_channel_cache()
+
+        self.addCleanup(_restore)
+        sms_channel.batch_recipients = 1
+        sms_channel.save()
+        self.assertEqual(get_channel_config(sms_channel.name).batch_recipients, 1)
+
+        self.assertIsNone(get_channel_config("non-existent-channel"))
+
+    def test_acquire_send_token(self):
+        from .notification_channel import acquire_send_token
+        channel = frappe._dict(get_rate_limit=lambda sender_type, sender: (5, 10))
+
+        with patch("frappe.get_cached_doc", return_value=channel):
+            with patch("frappe_notification.frappe_notification.doctype.notification_channel."
+                       "notification_channel.rate_limit") as rate_limit:
+                acquire_send_token("SMS", "Email Account", "Test Account")
+
+        rate_limit.assert_called_once_with(
+            "notification_channel:SMS:Email Account:Test Account", rate=5, burst=10)
+
+    def test_acquire_send_token_over_rate_limit(self):
+        """
+        Callers are not kept waiting beyond max_wait, & do not use up a token then
+        """
+        from frappe_notification import RateLimitExceeded
+        from frappe_notification.utils.throttle import rate_limit
+
+        key = f"test_rate_limit:{frappe.generate_hash()}"
+        self.addCleanup(lambda: frappe.cache().delete(
+            frappe.cache().make_key(f"frappe_notification:rate_limit:{key}")))
+
+        rate_limit(key, rate=0.1, burst=1, max_wait=1)
+        for i in range(3):
+            with self.assertRaises(RateLimitExceeded) as ctx:
+                rate_limit(key, rate=0.1, burst=1, max_wait=1)
+
+            # The wait doesn't grow with the callers turned away
+            self.assertTrue(9 < ctx.exception.data.retry_after <= 10)
+
+    def test_acquire_send_token_without_limit(self):
+        from .notification_channel import acquire_send_token
+        channel = frappe._dict(get_rate_limit=lambda sender_type, sender: (0, 0))
+
+        with patch("frappe.get_cached_doc", return_value=channel):
+            with patch("frappe_notification.frappe_notification.doctype.notification_channel."
+                       "notification_channel.rate_limit") as rate_limit:
+                acquire_send_token("SMS", None, None)
+
+        rate_limit.assert_not_called()
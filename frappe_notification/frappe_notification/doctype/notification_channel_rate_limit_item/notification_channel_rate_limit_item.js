@@ -0,0 +1,8 @@
+// Copyright (c) 2022, Leam Technology Systems and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Notification Channel Rate Limit Item', {
+	// refresh: function(frm) {
+
+	// }
+});
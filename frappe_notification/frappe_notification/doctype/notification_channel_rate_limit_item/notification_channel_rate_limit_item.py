@@ -0,0 +1,12 @@
+# Copyright (c) 2022, Leam Technology Systems and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class NotificationChannelRateLimitItem(Document):
+    sender_type: str
+    sender: str
+    rate_limit: float
+    rate_limit_burst: int
@@ -6,6 +6,7 @@ import frappe
 from frappe.model.document import Document
 
 from frappe_notification.utils import FrappeNotificationException
+from frappe_notification.utils.client import clear_client_auth_cache
 from ..notification_client_item.notification_client_item import NotificationClientItem
 from ..notification_client_custom_template.notification_client_custom_template import \
     NotificationClientCustomTemplate
@@ -64,6 +65,19 @@ class NotificationClient(Document):
             self.validate_demotion()
             self.validate_manager()
 
+    def on_update(self):
+        from ..notification_template.notification_template import clear_template_key_cache
+
+        # Secret, enabled or manager could have changed
+        clear_client_auth_cache(self.api_key)
+        clear_template_key_cache()
+
+    def on_trash(self):
+        from ..notification_template.notification_template import clear_template_key_cache
+
+        clear_client_auth_cache(self.api_key)
+        clear_template_key_cache()
+
     def validate_manager(self):
         if not self.managed_by:
             return
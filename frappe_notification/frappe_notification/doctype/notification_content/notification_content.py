@@ -0,0 +1,64 @@
+# Copyright (c) 2022, Leam Technology Systems and contributors
+# For license information, please see license.txt
+
+import hashlib
+from typing import List, Optional, Tuple
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+# Seconds a Notification Content is kept in redis after it is read
+CONTENT_CACHE_TTL = 60 * 60
+
+
+class NotificationContent(Document):
+    """
+    Rendered subject & content of notifications, stored once & named by their hash
+    Referenced by Notification Outbox & its Items with content_hash
+    """
+    subject: str
+    content: str
+
+
+def get_content_hash(subject: Optional[str], content: Optional[str]) -> str:
+    return hashlib.sha256(
+        frappe.as_json([subject, content], indent=None).encode()).hexdigest()
+
+
+def store_contents(contents: List[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    """
+    Writes the (subject, content) pairs that are not stored already, with multi-row INSERTs
+    Returns the content hash of each of the pairs
+    """
+    hashes = [get_content_hash(*x) for x in contents]
+    if not hashes:
+        return hashes
+
+    now = now_datetime()
+    fields = [
+        "name", "owner", "modified_by", "creation", "modified", "docstatus", "subject", "content"]
+    values = [
+        [content_hash, frappe.session.user, frappe.session.user, now, now, 0, subject, content]
+        for content_hash, (subject, content) in dict(zip(hashes, contents)).items()
+    ]
+    frappe.db.bulk_insert("Notification Content", fields, values, ignore_duplicates=True)
+
+    return hashes
+
+
+def get_content(content_hash: str) -> frappe._dict:
+    """
+    Subject & Content stored under the hash. Contents never change, they are cached in redis
+    """
+    cache_key = f"frappe_notification:content:{content_hash}"
+    content = frappe.cache().get_value(cache_key)
+    if content is None:
+        content = frappe.db.get_value(
+            "Notification Content", content_hash, ["subject", "content"], as_dict=1)
+        if not content:
+            return frappe._dict(subject=None, content=None)
+
+        frappe.cache().set_value(cache_key, content, expires_in_sec=CONTENT_CACHE_TTL)
+
+    return frappe._dict(content)
@@ -1,2 +1,2 @@
-from .notification_outbox import NotificationOutbox, NotificationOutboxStatus, RecipientsBatchItem  # noqa
+from .notification_outbox import DRAFT_OUTBOX_RETENTION, IDEMPOTENCY_KEY_RETENTION, NotificationOutbox, NotificationOutboxStatus, NotificationPriority, RecipientsBatchItem, defer_outbox_recipients, delete_stale_draft_outboxes, dispatch_outbox_in_chunks, get_idempotent_outbox, get_outbox_without_recipients, update_outbox_recipient_status  # noqa
 from .test_notification_outbox import NotificationOutboxFixtures  # noqa
@@ -1,30 +1,54 @@
 # Copyright (c) 2022, Leam Technology Systems and contributors
 # For license information, please see license.txt
+import random
 from typing import List, Dict, Callable, Optional, Tuple, Union
 from enum import Enum
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import now_datetime
+from frappe.utils import add_to_date, now_datetime
 
 from frappe_notification import (
     NotificationChannelHandlerNotFound,
     NotificationChannelDisabled,
     NotificationChannelNotFound,
-    RecipientErrors)
+    NotificationOutboxNotFound,
+    RecipientErrors,
+    ValidationError)
 from frappe_notification.utils.exceptions import FrappeNotificationException
+from frappe_notification.utils.throttle import concurrency_limit
 
+from ..notification_channel.notification_channel import (
+    get_channel_config, get_channel_configs, get_channel_registry)
+from ..notification_content.notification_content import get_content, store_contents
 from ..notification_outbox_recipient_item.notification_outbox_recipient_item import \
     NotificationOutboxRecipientItem
+from ..notification_recipient_log.notification_recipient_log import (
+    delete_recipient_logs, insert_recipient_logs)
 
 
 class NotificationOutboxStatus(Enum):
+    DRAFT = "Draft"
+    QUEUED = "Queued"
     SUCCESS = "Success"
     PENDING = "Pending"
     FAILED = "Failed"
     PARTIAL_SUCCESS = "Partial Success"
 
 
+class NotificationPriority(Enum):
+    HIGH = "High"
+    NORMAL = "Normal"
+    BULK = "Bulk"
+
+
+# Queues of the priority lanes. Normal priority goes on the queue of the channel
+PRIORITY_QUEUES = {
+    NotificationPriority.HIGH: "short",
+    NotificationPriority.BULK: "long",
+}
+
+
 class RecipientsBatchItem(frappe._dict):
     outbox_row_name: str
     user_identifier: str
@@ -36,6 +60,9 @@ class RecipientsBatch(frappe._dict):
     channel_args: str
     sender_type: str
     sender: str
+    subject: Optional[str]
+    content: Optional[str]
+    content_hash: Optional[str]
     recipients: List[RecipientsBatchItem]
 
 
@@ -62,6 +89,40 @@ class ChannelHandlerParamsBatched(ChannelHandlerParamsBase):
 
 
 HOOK_NOTIFICATION_CHANNEL_HANDLER = "notification_channel_handler"
+HOOK_NOTIFICATION_CHANNEL_BATCH_VALIDATOR = "notification_channel_batch_validator"
+
+# When batch_recipients_size is not specified on a batching channel
+DEFAULT_BATCH_RECIPIENTS_SIZE = 5
+
+# Outbox Item fields specified by the sender
+RECIPIENT_ITEM_FIELDS = [
+    "channel", "channel_id", "channel_args", "user_identifier", "sender_type", "sender",
+    "subject", "content", "content_hash"]
+
+# Outbox counter field for each of the Outbox Item statuses
+COUNTER_FIELDS = {
+    NotificationOutboxStatus.PENDING: "pending_count",
+    NotificationOutboxStatus.SUCCESS: "success_count",
+    NotificationOutboxStatus.FAILED: "failed_count",
+}
+
+# Upper bound of the wait between two attempts of a failed notification, in seconds
+MAX_RETRY_DELAY = 24 * 60 * 60
+
+# Number of due Outbox Items re-dispatched by a single run of dispatch_due_retries
+RETRY_DISPATCH_LIMIT = 1000
+
+# Job timeout of run_channel_handler, in seconds. The concurrency slot of the job expires with it
+CHANNEL_HANDLER_TIMEOUT = 300
+
+# Seconds the recipients wait for a slot of a channel at its max_concurrent_jobs, at the least
+CONCURRENCY_RETRY_DELAY = 30
+
+# Seconds an idempotency_key keeps returning the Outbox sent with it
+IDEMPOTENCY_KEY_RETENTION = 24 * 60 * 60
+
+# Seconds a Draft Outbox is kept for, to be finalized. Check delete_stale_draft_outboxes
+DRAFT_OUTBOX_RETENTION = 7 * 24 * 60 * 60
 
 
 class NotificationOutbox(Document):
@@ -73,48 +134,280 @@ class NotificationOutbox(Document):
     - While actually triggering the notification in a background job
         - The handler is responsible in updating the status of the Outbox Item
 
-    - This document can be extended to include support for retrying failed notifications
+    - Failed notifications are retried upto max_attempts of the channel
+        - The row stays Pending till then, with next_attempt_on set to when it is due
+        - Due rows are re-dispatched by the scheduled job dispatch_due_retries
+    - Recipients of a channel running its max_concurrent_jobs are deferred the same way,
+      without using up an attempt. Check run_channel_handler
+    - So are the recipients of a channel over its rate limit. Check acquire_send_token
+
+    Queued Outboxes are drafts holding the send request (queued_args), which gets
+    rendered, validated & submitted in a background job. Check NotificationTemplate
+
+    Recipients set on flags.bulk_recipients are written with multi-row INSERTs on submit,
+    instead of being inserted one by one through the ORM. Useful for very large sends
+
+    Outbox Items with a subject / content of their own are sent that instead of the one
+    of the Outbox. Check NotificationTemplate.render_recipient_templates
+
+    Outbox Items reaching Success are written to Notification Recipient Log, which the
+    Notification Logs of the recipients are read from
+
+    On submit, the subject & content of the Outbox & its Items are moved to Notification Content,
+    where identical ones are stored once. They are referenced by content_hash. Use get_content()
+
+    Draft Outboxes receive their recipients in chunks, for sends too large for a single request.
+    Each chunk is validated & written with multi-row INSERTs, without loading the Outbox Items
+    already written. Once finalized, the Outbox is dispatched chunk by chunk in a background job
+    Check append_recipients, finalize & dispatch_outbox_in_chunks
+
+    idempotency_key is unique per notification_client. Sends repeated with the same key return
+    the Outbox of the first one, for IDEMPOTENCY_KEY_RETENTION. Check get_idempotent_outbox
     """
     subject: str
     content: str
+    content_hash: str
     notification_client: str
+    notification_template: str
+    priority: str
+    idempotency_key: str
     status: str
+    pending_count: int
+    success_count: int
+    failed_count: int
     recipients: List[NotificationOutboxRecipientItem]
+    queued_args: str
+    error: str
 
     _channel_handlers: Dict[str, Callable] = None
+    _channel_batch_validators: Dict[str, Optional[Callable]] = None
+
+    # Number of Outbox Items written per multi-row INSERT
+    BULK_INSERT_CHUNK_SIZE = 1000
+
+    # Max number of recipients in a single append_recipients call
+    APPEND_RECIPIENTS_LIMIT = 10000
+
+    # Number of Outbox Items loaded & dispatched at a time, by dispatch_outbox_in_chunks
+    DISPATCH_CHUNK_SIZE = 1000
+
+    # Fields of the Outbox loaded without its Items. Check get_outbox_without_recipients
+    PARENT_FIELDS = [
+        "name", "docstatus", "status", "notification_client", "notification_template", "priority",
+        "subject", "content", "content_hash", "queued_args", "pending_count",
+    ]
 
     def validate(self):
         """ All validations kick in on_submit """
         pass
 
+    def onload(self):
+        self.update(self.get_content())
+
     def before_submit(self):
         self.status = NotificationOutboxStatus.PENDING.value
         for row in self.recipients:
             row.status = NotificationOutboxStatus.PENDING.value
 
+        self.pending_count = len(self.recipients) + len(self.flags.bulk_recipients or [])
+        self.success_count = 0
+        self.failed_count = 0
+
+        self.store_contents()
+
+    def store_contents(self):
+        """
+        Moves the subject & content of the Outbox & its Items to Notification Content
+        """
+        rows = [
+            x for x in [self, *self.recipients, *(self.flags.bulk_recipients or [])]
+            if x.get("subject") or x.get("content")
+        ]
+        content_hashes = store_contents([(x.get("subject"), x.get("content")) for x in rows])
+        for row, content_hash in zip(rows, content_hashes):
+            row.update(dict(subject=None, content=None, content_hash=content_hash))
+
+    def get_content(self) -> frappe._dict:
+        """
+        Subject & Content of the Outbox
+        """
+        if self.content_hash:
+            return get_content(self.content_hash)
+
+        return frappe._dict(subject=self.subject, content=self.content)
+
+    def on_trash(self):
+        delete_recipient_logs(self.name)
+
     def on_submit(self):
+        if self.flags.bulk_recipients:
+            self.insert_recipients_in_bulk(self.flags.pop("bulk_recipients"))
+
         self.validate_recipient_channel_ids()
         self.send_pending_notifications()
 
+    def insert_recipients_in_bulk(self, recipients: List[dict], idx_offset: int = 0):
+        """
+        Appends the recipients to the Outbox & writes them in chunks of BULK_INSERT_CHUNK_SIZE
+        with multi-row INSERTs. The Outbox itself should already be in the db.
+        Please note that the Link fields on the rows are not validated here.
+        - idx_offset: Number of Outbox Items already in the db, but not loaded on the Outbox
+        """
+        now = now_datetime()
+        status = NotificationOutboxStatus.PENDING.value if self.docstatus == 1 else None
+        fields = [
+            "name", "owner", "creation", "modified", "modified_by", "docstatus",
+            "parent", "parenttype", "parentfield", "idx", "status",
+            *RECIPIENT_ITEM_FIELDS
+        ]
+
+        for i in range(0, len(recipients), self.BULK_INSERT_CHUNK_SIZE):
+            values = []
+            for recipient in recipients[i:i + self.BULK_INSERT_CHUNK_SIZE]:
+                row: NotificationOutboxRecipientItem = self.append("recipients", recipient)
+                row.update(dict(
+                    name=frappe.generate_hash(length=10),
+                    idx=row.idx + idx_offset,
+                    owner=frappe.session.user,
+                    modified_by=frappe.session.user,
+                    creation=now,
+                    modified=now,
+                    docstatus=self.docstatus,
+                    status=status or row.status or NotificationOutboxStatus.PENDING.value,
+                ))
+                values.append([row.get(x) for x in fields])
+
+            frappe.db.bulk_insert("Notification Outbox Recipient Item", fields, values)
+
+    def append_recipients(self, recipients: List[dict]):
+        """
+        Validates & writes a chunk of recipients to a Draft Outbox
+        Load the Outbox with get_outbox_without_recipients(for_update=True), so that concurrent
+        appends to the same Outbox are serialized & the Items already written are not loaded
+        """
+        if self.status != NotificationOutboxStatus.DRAFT.value or self.docstatus != 0:
+            raise ValidationError(frappe._("Recipients can only be appended to a Draft Outbox"))
+
+        if not recipients:
+            raise ValidationError(frappe._("Please specify the recipients"))
+
+        if len(recipients) > self.APPEND_RECIPIENTS_LIMIT:
+            raise ValidationError(
+                frappe._("At most {0} recipients can be appended at a time").format(
+                    self.APPEND_RECIPIENTS_LIMIT))
+
+        # Validated before anything gets written
+        self.recipients = []
+        for recipient in recipients:
+            self.append("recipients", recipient)
+        self.validate_recipient_channel_ids()
+        self.store_contents()
+
+        recipients = [x.as_dict(no_default_fields=True) for x in self.recipients]
+        self.recipients = []
+        self.insert_recipients_in_bulk(recipients, idx_offset=self.pending_count or 0)
+
+        self.pending_count = (self.pending_count or 0) + len(recipients)
+        frappe.db.set_value(
+            "Notification Outbox", self.name, "pending_count", self.pending_count,
+            update_modified=False)
+
+    def finalize(self):
+        """
+        Submits a Draft Outbox, once all of its recipients are appended
+        The Outbox Items are dispatched in background: dispatch_outbox_in_chunks
+        """
+        if self.status != NotificationOutboxStatus.DRAFT.value or self.docstatus != 0:
+            raise ValidationError(frappe._("Only a Draft Outbox can be finalized"))
+
+        if not self.pending_count:
+            raise ValidationError(frappe._("Please append the recipients first"))
+
+        self.docstatus = 1
+        self.status = NotificationOutboxStatus.PENDING.value
+        frappe.db.set_value("Notification Outbox", self.name, dict(
+            docstatus=self.docstatus,
+            status=self.status,
+            success_count=0,
+            failed_count=0,
+            queued_args=None,
+        ))
+
+        frappe.enqueue(
+            dispatch_outbox_in_chunks,
+            queue=self.get_dispatch_queue(frappe._dict()),
+            outbox=self.name,
+            enqueue_after_commit=True,
+            now=frappe.flags.in_test,
+        )
+
     def send_pending_notifications(self):
+        """
+        Enqueues the handler jobs, on the queue of each channel or of the priority lane
+        Jobs of channels with max_concurrent_jobs are wrapped with run_channel_handler
+        """
+        priority = NotificationPriority(self.priority or NotificationPriority.NORMAL.value)
+        dispatch_settings = self.get_channel_dispatch_settings()
         recipients = self.get_batched_recipients()
         for r in recipients:
             params = _get_channel_handler_invoke_params(self, r)
             fn = self.get_channel_handler(params.channel)
+            if not callable(fn):
+                # The channel got disabled or removed since the Outbox was validated, on retries
+                self.update_recipient_status({
+                    x: NotificationOutboxStatus.FAILED for x in _get_outbox_row_names(r)})
+                continue
+
             fn.fnargs = params.keys()  # please check frappe.call implementation
 
+            settings = dispatch_settings.get(params.channel) or frappe._dict()
+            queue = self.get_dispatch_queue(settings)
+            timeout = None
+
+            # High priority notifications do not wait behind the other jobs of the channel
+            if settings.max_concurrent_jobs and priority != NotificationPriority.HIGH:
+                params = dict(
+                    **params,
+                    handler=fn,
+                    max_concurrent_jobs=settings.max_concurrent_jobs)
+                fn = run_channel_handler
+                timeout = CHANNEL_HANDLER_TIMEOUT
+
             frappe.enqueue(
                 fn,
+                queue=queue,
+                timeout=timeout,
                 enqueue_after_commit=True,
                 now=frappe.flags.in_test,
                 **params
             )
 
+    def get_dispatch_queue(self, channel_settings: frappe._dict) -> str:
+        """
+        - High priority: short queue, so that they are not stuck behind large sends
+        - Normal priority: queue of the channel
+        - Bulk priority: queue of the channel if it has one, long queue otherwise
+        """
+        priority = NotificationPriority(self.priority or NotificationPriority.NORMAL.value)
+        if priority == NotificationPriority.HIGH:
+            return PRIORITY_QUEUES[priority]
+
+        return channel_settings.queue or PRIORITY_QUEUES.get(priority) or "default"
+
+    def get_channel_dispatch_settings(self) -> Dict[str, frappe._dict]:
+        """
+        Queue & concurrency limits of the channels
+        """
+        return get_channel_configs()
+
     def validate_recipient_channel_ids(self):
         """
         1st Phase Handler Invocation
         Handlers can validate if it can do well with the params specified
         If any one handler stands back, none of the notifications get sent
+
+        Channels that declare a batch validator (hook: notification_channel_batch_validator)
+        get all of its recipients in a single call instead of one handler call per recipient
         """
         errors = []
 
@@ -125,19 +418,40 @@ class NotificationOutbox(Document):
             err.update(dict(params))
             return err
 
+        batch_sizes = self.get_channel_batch_sizes()
+
+        recipients_by_channel: Dict[
+            str, List[Union[ChannelHandlerParams, ChannelHandlerParamsBatched]]] = dict()
         for row in self.recipients:
+            if row.channel in batch_sizes:
+                # Batching channels get the params they are dispatched with, a batch of one
+                row = _get_recipients_batch(row, items=[_get_recipients_batch_item(row)])
+
             params = _get_channel_handler_invoke_params(self, row)
             params.to_validate = True
+            recipients_by_channel.setdefault(params.channel, []).append(params)
 
-            handler = self.get_channel_handler(params.channel)
+        for channel, recipients in recipients_by_channel.items():
+            handler = self.get_channel_handler(channel)
             if not callable(handler):
-                errors.append(_process_exc(params, handler))
+                errors.extend([_process_exc(params, handler) for params in recipients])
+                continue
+
+            batch_validator = self.get_channel_batch_validator(channel)
+            if batch_validator:
+                try:
+                    row_errors = batch_validator(channel=channel, recipients=recipients) or dict()
+                except BaseException as e:
+                    row_errors = {idx: e for idx in range(len(recipients))}
+
+                errors.extend([_process_exc(recipients[idx], e) for idx, e in row_errors.items()])
                 continue
 
-            try:
-                handler(**params)
-            except BaseException as e:
-                errors.append(_process_exc(params, e))
+            for params in recipients:
+                try:
+                    handler(**params)
+                except BaseException as e:
+                    errors.append(_process_exc(params, e))
 
         if len(errors):
             raise RecipientErrors(recipient_errors=errors)
@@ -145,101 +459,83 @@ class NotificationOutbox(Document):
     def get_channel_handler(self, channel: str) -> Union[Callable, FrappeNotificationException]:
         """
         Gets the channel handler or Exception instance where applicable
+        Resolved handlers are kept in the channel registry of the process
         """
         if self._channel_handlers is None:
             self._channel_handlers = dict()
 
-        if channel in self._channel_handlers:
-            return self._channel_handlers.get(channel)
+        if channel not in self._channel_handlers:
+            registry = get_channel_registry().setdefault("handlers", dict())
+            handler = registry.get(channel) or _resolve_channel_handler(channel)
+            # Unknown channel names come from the clients, they are not kept around
+            if not isinstance(handler, NotificationChannelNotFound):
+                registry[channel] = handler
 
-        def _set_handler(handler):
             self._channel_handlers[channel] = handler
-            return handler
-
-        if not frappe.db.exists("Notification Channel", channel):
-            return _set_handler(NotificationChannelNotFound(channel=channel))
 
-        if not frappe.db.get_value("Notification Channel", channel, "enabled"):
-            return _set_handler(NotificationChannelDisabled(channel=channel))
+        return self._channel_handlers.get(channel)
 
-        handler = frappe.get_hooks(HOOK_NOTIFICATION_CHANNEL_HANDLER, dict()).get(channel)
+    def get_channel_batch_validator(self, channel: str) -> Optional[Callable]:
+        """
+        Gets the batch validator of the channel, None if the channel do not have one
+        """
+        if self._channel_batch_validators is None:
+            self._channel_batch_validators = dict()
 
-        if isinstance(handler, (list, tuple)):
-            handler = handler[0]
-        if isinstance(handler, str):
-            handler = frappe.get_attr(handler)
+        if channel not in self._channel_batch_validators:
+            registry = get_channel_registry().setdefault("batch_validators", dict())
+            if channel not in registry:
+                registry[channel] = _get_channel_hook_fn(
+                    HOOK_NOTIFICATION_CHANNEL_BATCH_VALIDATOR, channel)
 
-        if not handler:
-            return _set_handler(NotificationChannelHandlerNotFound(channel=channel))
+            self._channel_batch_validators[channel] = registry[channel]
 
-        return _set_handler(handler)
+        return self._channel_batch_validators.get(channel)
 
     def update_recipient_status(self, recipient_status: Dict[str, NotificationOutboxStatus]):
         """
         Update the OutboxItem status & the status of the Outbox itself
+        The rows are updated in the db directly, the loaded document is kept in sync
         """
         if self.docstatus != 1:
             return
 
-        has_update = False
-        for r in self.recipients:
-            if r.name not in recipient_status:
-                continue
-
-            if r.status == recipient_status[r.name].value:
-                continue
-
-            has_update = True
-            r.status = recipient_status[r.name].value
-            if r.status == NotificationOutboxStatus.SUCCESS.value:
-                r.time_sent = now_datetime()
-
-        if not has_update:
+        outbox_status = update_outbox_recipient_status(self.name, recipient_status)
+        if not outbox_status:
             return
 
-        # Update Outbox Status
-        row_statuses = set([NotificationOutboxStatus(x.status) for x in self.recipients])
-        if NotificationOutboxStatus.PENDING in row_statuses:
-            self.status = NotificationOutboxStatus.PENDING.value
-        elif len(row_statuses) == 1:
-            self.status = row_statuses.pop().value
-        else:
-            self.status = NotificationOutboxStatus.PARTIAL_SUCCESS.value
+        # Failed rows could still be Pending, waiting for a retry
+        rows = {
+            x.name: x
+            for x in frappe.get_all(
+                "Notification Outbox Recipient Item",
+                dict(name=("in", list(recipient_status.keys()))),
+                ["name", "status", "time_sent", "attempts", "next_attempt_on"])
+        }
+        for r in self.recipients:
+            if r.name in rows:
+                r.update(rows[r.name])
 
-        self.flags.ignore_validate_update_after_submit = True
-        self.save(ignore_permissions=True)
+        self.update(frappe.db.get_value(
+            "Notification Outbox", self.name,
+            ["status", "pending_count", "success_count", "failed_count"], as_dict=1))
 
     def get_batched_recipients(
             self
     ) -> List[Union[NotificationOutboxRecipientItem, RecipientsBatch]]:
         """
-        Batch similar Recipients together.
+        Batch similar Recipients together, for the channels with batch_recipients enabled.
         Batching rules:
         - Same Channel
         - Same Channel Args
+        - Same Sender
+        - Same Subject & Content
+        - Not more than batch_recipients_size of the channel
         """
-        supported_channels = {
-            x.name: x.batch_recipients_size or 5
-            for x in frappe.get_all(
-                "Notification Channel",
-                dict(batch_recipients=1))
-        }
+        batch_sizes = self.get_channel_batch_sizes()
 
         batches = []
-        active_batch = dict()
-
-        def _finalize_active_batch(k: Tuple[str, str]):
-            _batch = active_batch[k]
-            del _batch["count"]
-            del active_batch[k]
-
-            batches.append(RecipientsBatch(dict(
-                channel=k[0],
-                channel_args=k[1],
-                sender_type=k[2],
-                sender=k[3],
-                channel_ids=_batch,
-            )))
+        active_batches: Dict[Tuple[str, ...], RecipientsBatch] = dict()
 
         for r in self.recipients:
             if r.status is None:
@@ -247,27 +543,350 @@ class NotificationOutbox(Document):
             if r.status != NotificationOutboxStatus.PENDING.value:
                 continue
 
-            if r.channel not in supported_channels:
+            if r.channel not in batch_sizes:
                 # Add back as normal Recipient Item
                 batches.append(r)
                 continue
 
-            k = (r.channel, r.channel_args, r.sender_type, r.sender_type)
-            _batch_item: dict = active_batch.setdefault(k, frappe._dict(count=0))
-            _user_identifier: list = _batch_item.setdefault(r.user_identifier, [])
-            _user_identifier.append(r.channel_id)
-            _batch_item.count += 1
+            k = (r.channel, r.channel_args, r.sender_type, r.sender,
+                 r.subject, r.content, r.content_hash)
+            if k not in active_batches:
+                active_batches[k] = _get_recipients_batch(r)
+
+            batch = active_batches[k]
+            batch.recipients.append(_get_recipients_batch_item(r))
 
-            if _batch_item.count >= supported_channels[r.channel]:
+            if len(batch.recipients) >= batch_sizes[r.channel]:
                 # Current batch is full. Wrap it up and let's reset.
-                _finalize_active_batch(k)
+                batches.append(active_batches.pop(k))
 
         # Finalize incomplete batches
-        for k in list(active_batch.keys()):
-            _finalize_active_batch(k)
+        batches.extend(active_batches.values())
 
         return batches
 
+    def get_channel_batch_sizes(self) -> Dict[str, int]:
+        """
+        Batch sizes of the channels that batch recipients
+        """
+        return {
+            x.name: x.batch_recipients_size or DEFAULT_BATCH_RECIPIENTS_SIZE
+            for x in get_channel_configs().values()
+            if x.batch_recipients
+        }
+
+
+def run_channel_handler(handler: Callable, max_concurrent_jobs: int, **params):
+    """
+    Background job running the channel handler,
+    only while there are less than max_concurrent_jobs of the channel running
+
+    The job doesn't wait for a slot, holding up its worker. Its recipients are deferred for
+    dispatch_due_retries to pick them up again instead
+    """
+    with concurrency_limit(
+            f"notification_channel:{params.get('channel')}", limit=max_concurrent_jobs,
+            expires_in=CHANNEL_HANDLER_TIMEOUT) as acquired:
+        if acquired:
+            return handler(**params)
+
+    row_names = [x.outbox_row_name for x in params.get("recipients")] \
+        if params.get("recipients") else [params.get("outbox_row_name")]
+    defer_outbox_recipients(
+        params.get("outbox"), row_names,
+        delay=random.uniform(CONCURRENCY_RETRY_DELAY, 2 * CONCURRENCY_RETRY_DELAY))
+
+
+def defer_outbox_recipients(outbox: str, row_names: List[str], delay: float):
+    """
+    Dispatches the Pending Outbox Items again after `delay` seconds, with dispatch_due_retries
+    Unlike a failed attempt, the attempts of the Items are left as is
+    """
+    if not row_names:
+        return
+
+    now = now_datetime()
+    frappe.db.sql("""
+    UPDATE `tabNotification Outbox Recipient Item`
+    SET
+        next_attempt_on = %(next_attempt_on)s,
+        modified = %(now)s
+    WHERE
+        parent = %(outbox)s
+        AND parenttype = 'Notification Outbox'
+        AND name IN %(row_names)s
+        AND status = 'Pending'
+    """, dict(
+        outbox=outbox, row_names=list(row_names), now=now,
+        next_attempt_on=add_to_date(now, seconds=delay)))
+
+
+def on_doctype_update():
+    frappe.db.add_unique(
+        "Notification Outbox", ["notification_client", "idempotency_key"],
+        constraint_name="unique_client_idempotency_key")
+
+
+def get_idempotent_outbox(
+        client: str,
+        idempotency_key: str,
+        for_update: bool = False) -> Optional[NotificationOutbox]:
+    """
+    The Outbox the client sent with idempotency_key, within IDEMPOTENCY_KEY_RETENTION
+    An expired key is released, so that it can be sent with again
+    for_update reads the latest committed row, like after losing an insert to a concurrent send
+    """
+    if not client or not idempotency_key:
+        return None
+
+    outbox = frappe.db.get_value(
+        "Notification Outbox",
+        dict(notification_client=client, idempotency_key=idempotency_key),
+        ["name", "creation"], as_dict=1, for_update=for_update)
+    if not outbox:
+        return None
+
+    if outbox.creation < add_to_date(now_datetime(), seconds=-IDEMPOTENCY_KEY_RETENTION):
+        frappe.db.set_value(
+            "Notification Outbox", outbox.name, "idempotency_key", None, update_modified=False)
+        return None
+
+    return frappe.get_doc("Notification Outbox", outbox.name)
+
+
+def clear_expired_idempotency_keys():
+    """
+    Daily job releasing the idempotency keys older than IDEMPOTENCY_KEY_RETENTION
+    """
+    frappe.db.sql("""
+    UPDATE `tabNotification Outbox`
+    SET idempotency_key = NULL
+    WHERE
+        idempotency_key IS NOT NULL
+        AND creation < %(cutoff)s
+    """, dict(cutoff=add_to_date(now_datetime(), seconds=-IDEMPOTENCY_KEY_RETENTION)))
+
+
+def delete_stale_draft_outboxes():
+    """
+    Daily job deleting the Draft Outboxes not finalized within DRAFT_OUTBOX_RETENTION,
+    along with their Items. Each Outbox is committed on its own, as they could have
+    a very large number of Items
+    """
+    for outbox in frappe.get_all("Notification Outbox", dict(
+            docstatus=0,
+            status=NotificationOutboxStatus.DRAFT.value,
+            creation=("<", add_to_date(now_datetime(), seconds=-DRAFT_OUTBOX_RETENTION)),
+    ), pluck="name"):
+        frappe.db.sql("""
+        DELETE FROM `tabNotification Outbox Recipient Item`
+        WHERE
+            parent = %(outbox)s
+            AND parenttype = 'Notification Outbox'
+        """, dict(outbox=outbox))
+        frappe.db.sql("""
+        DELETE FROM `tabNotification Outbox`
+        WHERE
+            name = %(outbox)s
+            AND docstatus = 0
+        """, dict(outbox=outbox))
+
+        if not frappe.flags.in_test:
+            frappe.db.commit()
+
+
+def get_outbox_without_recipients(outbox: str, for_update: bool = False) -> NotificationOutbox:
+    """
+    The Outbox, without loading its Items. Useful with Outboxes with a very large number of Items
+    """
+    values = frappe.db.get_value(
+        "Notification Outbox", outbox, NotificationOutbox.PARENT_FIELDS,
+        as_dict=1, for_update=for_update)
+    if not values:
+        raise NotificationOutboxNotFound(outbox=outbox)
+
+    return NotificationOutbox(dict(doctype="Notification Outbox", **values))
+
+
+def dispatch_outbox_in_chunks(outbox: str, last_row: Optional[str] = None):
+    """
+    Background job of NotificationOutbox.finalize
+    Submits & dispatches the Outbox Items that are not submitted yet, DISPATCH_CHUNK_SIZE at a time
+    Each chunk is a job of its own, enqueueing the job of the next chunk. So that no job has to
+    outlive the queue timeout & the memory used stays the same irrespective of the number of
+    recipients. A job that failed could be run again, without dispatching any Item twice
+
+    The Items are paged by name, after last_row, a range scan on the parent index
+    """
+    outbox = get_outbox_without_recipients(outbox)
+    if outbox.docstatus != 1:
+        return
+
+    rows = frappe.db.sql("""
+    SELECT
+        name, idx, status, attempts,
+        channel, channel_id, channel_args, user_identifier, sender_type, sender,
+        subject, content, content_hash
+    FROM `tabNotification Outbox Recipient Item`
+    WHERE
+        parenttype = 'Notification Outbox'
+        AND parent = %(outbox)s
+        AND name > %(last_row)s
+        AND docstatus = 0
+    ORDER BY name
+    LIMIT %(limit)s
+    FOR UPDATE
+    """, dict(
+        outbox=outbox.name, last_row=last_row or "",
+        limit=NotificationOutbox.DISPATCH_CHUNK_SIZE,
+    ), as_dict=1)
+    if not rows:
+        return
+
+    frappe.db.sql("""
+    UPDATE `tabNotification Outbox Recipient Item`
+    SET docstatus = 1
+    WHERE name IN %(row_names)s
+    """, dict(row_names=[x.name for x in rows]))
+
+    outbox.recipients = []
+    outbox.extend("recipients", rows)
+    outbox.send_pending_notifications()
+
+    if len(rows) == NotificationOutbox.DISPATCH_CHUNK_SIZE:
+        frappe.enqueue(
+            dispatch_outbox_in_chunks,
+            queue=outbox.get_dispatch_queue(frappe._dict()),
+            outbox=outbox.name,
+            last_row=rows[-1].name,
+            enqueue_after_commit=True,
+            now=frappe.flags.in_test,
+        )
+
+
+def dispatch_due_retries():
+    """
+    Scheduled job re-dispatching the Outbox Items that are due for a retry
+    The due rows are picked in bulk, and dispatched outbox by outbox without loading the Outboxes
+    """
+    rows = frappe.db.sql("""
+    SELECT
+        name, parent, status, attempts,
+        channel, channel_id, channel_args, user_identifier, sender_type, sender,
+        subject, content, content_hash
+    FROM `tabNotification Outbox Recipient Item`
+    WHERE
+        parenttype = 'Notification Outbox'
+        AND next_attempt_on <= %(now)s
+        AND status = 'Pending'
+    ORDER BY next_attempt_on
+    LIMIT %(limit)s
+    FOR UPDATE
+    """, dict(now=now_datetime(), limit=RETRY_DISPATCH_LIMIT), as_dict=1)
+
+    if not rows:
+        return
+
+    frappe.db.sql("""
+    UPDATE `tabNotification Outbox Recipient Item`
+    SET next_attempt_on = NULL
+    WHERE name IN %(row_names)s
+    """, dict(row_names=[x.name for x in rows]))
+
+    rows_by_outbox: Dict[str, List[frappe._dict]] = dict()
+    for row in rows:
+        rows_by_outbox.setdefault(row.pop("parent"), []).append(row)
+
+    for outbox in frappe.get_all(
+            "Notification Outbox",
+            dict(name=("in", list(rows_by_outbox.keys())), docstatus=1),
+            ["name", "subject", "content", "content_hash", "priority", "docstatus"]):
+        # Only the rows being retried are set on the Outbox
+        outbox = NotificationOutbox(dict(
+            doctype="Notification Outbox",
+            **outbox,
+            recipients=rows_by_outbox[outbox.name]))
+        outbox.send_pending_notifications()
+
+
+def get_retry_delay(retry_backoff: int, attempt: int) -> float:
+    """
+    Seconds to wait before retrying a notification that failed its `attempt`th attempt
+    Exponential backoff, with a jitter of upto half of the wait so that the retries of a
+    failed send do not hit the gateway all at once
+    """
+    delay = min((retry_backoff or 0) * (2 ** (attempt - 1)), MAX_RETRY_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def _get_channel_retry_settings(channels: List[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    (max_attempts, retry_backoff) of the channels
+    """
+    configs = get_channel_configs()
+    return {
+        x: (configs[x].max_attempts or 1, configs[x].retry_backoff or 0)
+        for x in channels
+        if x in configs
+    }
+
+
+def _get_outbox_row_names(
+        recipient: Union[NotificationOutboxRecipientItem, RecipientsBatch]) -> List[str]:
+    if isinstance(recipient, RecipientsBatch):
+        return [x.outbox_row_name for x in recipient.recipients]
+
+    return [recipient.name]
+
+
+def _resolve_channel_handler(channel: str) -> Union[Callable, FrappeNotificationException]:
+    config = get_channel_config(channel)
+    if not config:
+        return NotificationChannelNotFound(channel=channel)
+
+    if not config.enabled:
+        return NotificationChannelDisabled(channel=channel)
+
+    handler = _get_channel_hook_fn(HOOK_NOTIFICATION_CHANNEL_HANDLER, channel)
+    if not handler:
+        return NotificationChannelHandlerNotFound(channel=channel)
+
+    return handler
+
+
+def _get_channel_hook_fn(hook: str, channel: str) -> Optional[Callable]:
+    fn = frappe.get_hooks(hook, dict()).get(channel)
+
+    if isinstance(fn, (list, tuple)):
+        fn = fn[0]
+    if isinstance(fn, str):
+        fn = frappe.get_attr(fn)
+
+    return fn
+
+
+def _get_recipients_batch(
+        recipient: NotificationOutboxRecipientItem,
+        items: Optional[List[RecipientsBatchItem]] = None) -> RecipientsBatch:
+    return RecipientsBatch(dict(
+        channel=recipient.channel,
+        channel_args=recipient.channel_args,
+        sender_type=recipient.sender_type,
+        sender=recipient.sender,
+        subject=recipient.subject,
+        content=recipient.content,
+        content_hash=recipient.content_hash,
+        recipients=items or [],
+    ))
+
+
+def _get_recipients_batch_item(recipient: NotificationOutboxRecipientItem) -> RecipientsBatchItem:
+    return RecipientsBatchItem(dict(
+        outbox_row_name=recipient.name,
+        user_identifier=recipient.user_identifier,
+        channel_id=recipient.channel_id,
+    ))
+
 
 def _get_channel_handler_invoke_params(
     outbox: NotificationOutbox,
@@ -280,13 +899,18 @@ def _get_channel_handler_invoke_params(
     if not channel_args:
         channel_args = dict()
 
+    # Contents of the Outbox Item fall back to the ones of the Outbox
+    content = get_content(recipient.get("content_hash")) if recipient.get("content_hash") \
+        else frappe._dict(subject=recipient.get("subject"), content=recipient.get("content"))
+    outbox_content = outbox.get_content()
+
     _common = dict(
         channel_args=channel_args,
         channel=recipient.get("channel"),
         sender=recipient.get("sender"),
         sender_type=recipient.get("sender_type"),
-        subject=outbox.get("subject"),
-        content=outbox.get("content"),
+        subject=content.subject or outbox_content.subject,
+        content=content.content or outbox_content.content,
         outbox=outbox.name,
         to_validate=False,
     )
@@ -303,3 +927,131 @@ def _get_channel_handler_invoke_params(
         user_identifier=recipient.get("user_identifier"),
         outbox_row_name=recipient.get("name"),
     ))
+
+
+def update_outbox_recipient_status(
+        outbox: str,
+        recipient_status: Dict[str, NotificationOutboxStatus]) -> Optional[str]:
+    """
+    Row-level update of Outbox Items, without loading or saving the whole Outbox
+    - Only the affected rows are locked & written, with a single UPDATE per status
+    - The per-status counters on the Outbox are incremented atomically in a single UPDATE,
+      the Outbox status is derived from the counters in the same statement
+
+    Concurrent workers finishing different recipients of the same Outbox only contend
+    on the counter UPDATE of the Outbox row, which is the last statement of the job
+
+    Pending rows that fail stay Pending while the channel allows more attempts,
+    with next_attempt_on set for dispatch_due_retries to pick them up
+
+    Returns the new status of the Outbox, None when nothing got updated
+    """
+    if not recipient_status:
+        return None
+
+    if frappe.db.get_value("Notification Outbox", outbox, "docstatus") != 1:
+        return None
+
+    current_status = frappe.db.sql("""
+    SELECT
+        name,
+        status,
+        channel,
+        attempts
+    FROM `tabNotification Outbox Recipient Item`
+    WHERE
+        parent = %(outbox)s
+        AND parenttype = 'Notification Outbox'
+        AND name IN %(row_names)s
+    FOR UPDATE
+    """, {
+        "outbox": outbox,
+        "row_names": list(recipient_status.keys()),
+    }, as_dict=1)
+
+    retry_settings = _get_channel_retry_settings(list(set(
+        x.channel for x in current_status
+        if recipient_status[x.name] == NotificationOutboxStatus.FAILED
+    )))
+
+    now = now_datetime()
+    counter_deltas = {x: 0 for x in COUNTER_FIELDS.values()}
+    rows_by_status: Dict[NotificationOutboxStatus, List[str]] = dict()
+    rows_to_retry: Dict[Tuple[str, int], List[str]] = dict()
+    for row in current_status:
+        new_status = NotificationOutboxStatus(recipient_status[row.name])
+        if row.status == new_status.value:
+            continue
+
+        if new_status == NotificationOutboxStatus.FAILED \
+                and row.status == NotificationOutboxStatus.PENDING.value:
+            max_attempts, _ = retry_settings.get(row.channel, (1, 0))
+            if (row.attempts or 0) + 1 < max_attempts:
+                rows_to_retry.setdefault((row.channel, row.attempts or 0), []).append(row.name)
+                continue
+
+        rows_by_status.setdefault(new_status, []).append(row.name)
+        counter_deltas[COUNTER_FIELDS[NotificationOutboxStatus(row.status)]] -= 1
+        counter_deltas[COUNTER_FIELDS[new_status]] += 1
+
+    # Rows of the same channel & attempt failing together are retried together
+    for (channel, attempts), row_names in rows_to_retry.items():
+        frappe.db.sql("""
+        UPDATE `tabNotification Outbox Recipient Item`
+        SET
+            attempts = attempts + 1,
+            next_attempt_on = %(next_attempt_on)s,
+            modified = %(now)s
+        WHERE
+            name IN %(row_names)s
+        """, {
+            "next_attempt_on": add_to_date(now, seconds=get_retry_delay(
+                retry_settings[channel][1], attempts + 1)),
+            "row_names": row_names,
+            "now": now,
+        })
+
+    if not rows_by_status:
+        return frappe.db.get_value("Notification Outbox", outbox, "status") \
+            if rows_to_retry else None
+
+    for status, row_names in rows_by_status.items():
+        frappe.db.sql("""
+        UPDATE `tabNotification Outbox Recipient Item`
+        SET
+            status = %(status)s,
+            time_sent = IF(%(status)s = 'Success', %(now)s, time_sent),
+            attempts = attempts + 1,
+            next_attempt_on = NULL,
+            modified = %(now)s
+        WHERE
+            name IN %(row_names)s
+        """, {
+            "status": status.value,
+            "row_names": row_names,
+            "now": now,
+        })
+
+    # Notification Logs of the recipients
+    insert_recipient_logs(rows_by_status.get(NotificationOutboxStatus.SUCCESS))
+
+    # Update Outbox Status
+    # Please note that `status` is evaluated first, on the counter values before the increment
+    frappe.db.sql("""
+    UPDATE `tabNotification Outbox`
+    SET
+        status = CASE
+            WHEN pending_count + %(pending_count)s > 0 THEN 'Pending'
+            WHEN failed_count + %(failed_count)s = 0 THEN 'Success'
+            WHEN success_count + %(success_count)s = 0 THEN 'Failed'
+            ELSE 'Partial Success'
+        END,
+        pending_count = pending_count + %(pending_count)s,
+        success_count = success_count + %(success_count)s,
+        failed_count = failed_count + %(failed_count)s,
+        modified = %(now)s
+    WHERE
+        name = %(outbox)s
+    """, dict(**counter_deltas, outbox=outbox, now=now))
+
+    return frappe.db.get_value("Notification Outbox", outbox, "status")
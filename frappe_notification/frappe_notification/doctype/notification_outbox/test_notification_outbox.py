@@ -12,6 +12,7 @@ from frappe_testing import TestFixture
 from frappe_notification import (
     NotificationClientFixtures,
     NotificationChannelFixtures,
+    clear_channel_cache,
     NotificationChannelNotFound,
     NotificationChannelHandlerNotFound,
     NotificationChannelDisabled,
@@ -22,8 +23,14 @@ from .notification_outbox import (
     NotificationOutbox,
     NotificationOutboxRecipientItem,
     RecipientsBatch,
+    RecipientsBatchItem,
     NotificationOutboxStatus,
+    NotificationPriority,
     _get_channel_handler_invoke_params,
+    dispatch_due_retries,
+    get_retry_delay,
+    run_channel_handler,
+    update_outbox_recipient_status,
     HOOK_NOTIFICATION_CHANNEL_HANDLER)
 
 
@@ -77,9 +84,12 @@ class TestNotificationOutbox(unittest.TestCase):
 
     def setUp(self):
         self.outboxes.setUp()
+        # Handlers are patched in most of the tests
+        clear_channel_cache()
 
     def tearDown(self) -> None:
         self.outboxes.tearDown()
+        clear_channel_cache()
 
     @classmethod
     def tearDownClass(cls):
@@ -119,6 +129,7 @@ class TestNotificationOutbox(unittest.TestCase):
 
         # Test str-method
         d._channel_handlers = dict()  # clear
+        clear_channel_cache()
         with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
             mock_get_hooks.side_effect = self._get_hooks_notification_handler(
                 sms_handler="frappe.handler.ping")
@@ -134,6 +145,7 @@ class TestNotificationOutbox(unittest.TestCase):
 
         # Test Undefined Handler
         d._channel_handlers = dict()  # clear
+        clear_channel_cache()
         with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
             mock_get_hooks.side_effect = self._get_hooks_notification_handler()
             _handler = d.get_channel_handler(sms_channel)
@@ -142,6 +154,7 @@ class TestNotificationOutbox(unittest.TestCase):
         # Test Disabled Channel
         frappe.db.set_value("Notification Channel", sms_channel, "enabled", 0)
         d._channel_handlers = dict()  # clear
+        clear_channel_cache()
         with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
             mock_get_hooks.side_effect = self._get_hooks_notification_handler(
                 sms_handler=_dummy_handler)
@@ -149,6 +162,34 @@ class TestNotificationOutbox(unittest.TestCase):
         self.assertIsInstance(_handler, NotificationChannelDisabled)
         frappe.db.set_value("Notification Channel", sms_channel, "enabled", 1)
 
+    def test_channel_registry(self):
+        """
+        Resolved handlers are shared by the Outboxes till the channel changes
+        """
+        sms_channel = self.channels.get_channel("sms")
+
+        def _dummy_handler(*args, **kwargs): None
+
+        with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
+            mock_get_hooks.side_effect = self._get_hooks_notification_handler(
+                sms_handler=_dummy_handler)
+            self.assertEqual(
+                self.get_draft_outbox().get_channel_handler(sms_channel), _dummy_handler)
+
+        # No more resolution for the other Outboxes
+        with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
+            self.assertEqual(
+                self.get_draft_outbox().get_channel_handler(sms_channel), _dummy_handler)
+            mock_get_hooks.assert_not_called()
+
+        # Saving the channel drops the registry
+        frappe.get_doc("Notification Channel", sms_channel).save()
+        with patch("frappe.get_hooks", spec=True) as mock_get_hooks:
+            mock_get_hooks.side_effect = self._get_hooks_notification_handler()
+            self.assertIsInstance(
+                self.get_draft_outbox().get_channel_handler(sms_channel),
+                NotificationChannelHandlerNotFound)
+
     def test_validate_recipient_channel_ids(self):
         """
         - Let's test the response of validation based on handler behavior
@@ -163,6 +204,7 @@ class TestNotificationOutbox(unittest.TestCase):
 
         sms_handler = self.get_channel_handler(sms_channel)
         d._channel_handlers[sms_channel] = sms_handler
+        d._channel_batch_validators = {sms_channel: None}
 
         # - Test valid number
         d.recipients = [[x for x in d.recipients if x.channel == sms_channel][0]]
@@ -190,6 +232,46 @@ class TestNotificationOutbox(unittest.TestCase):
         self.assertEqual(exc.data.recipient_errors[0].error_code,
                          "UNKNOWN_ERROR")
 
+    def test_validate_recipient_channel_ids_batched(self):
+        """
+        Channels with a batch validator are validated in a single call
+        """
+        sms_channel = self.channels.get_channel("sms")
+
+        d = self.get_draft_outbox()
+        d.recipients = [x for x in d.recipients if x.channel == sms_channel]
+        d.recipients[0].channel_id = self.VALID_MOBILE_NO
+        d.recipients[1].channel_id = self.INVALID_MOBILE_NO_1
+
+        sms_handler = self.get_channel_handler(sms_channel)
+        batch_validator = MagicMock()
+        batch_validator.side_effect = lambda channel, recipients: {
+            idx: self.CHANNEL_VERIFICATIONS[channel].get(r.channel_id)
+            for idx, r in enumerate(recipients)
+            if self.CHANNEL_VERIFICATIONS[channel].get(r.channel_id)
+        }
+
+        d._channel_handlers = {sms_channel: sms_handler}
+        d._channel_batch_validators = {sms_channel: batch_validator}
+
+        with self.assertRaises(RecipientErrors) as r:
+            d.validate_recipient_channel_ids()
+
+        sms_handler.assert_not_called()
+        batch_validator.assert_called_once()
+        self.assertEqual(len(batch_validator.call_args.kwargs["recipients"]), len(d.recipients))
+
+        exc = r.exception
+        self.assertEqual(len(exc.data.recipient_errors), 1)
+        self.assertEqual(exc.data.recipient_errors[0].channel_id, self.INVALID_MOBILE_NO_1)
+        self.assertEqual(exc.data.recipient_errors[0].error_code,
+                         self.CHANNEL_VERIFICATIONS[sms_channel].get(
+                             self.INVALID_MOBILE_NO_1).error_code)
+
+        # - All valid
+        d.recipients[1].channel_id = self.VALID_MOBILE_NO
+        d.validate_recipient_channel_ids()
+
     def test_recipients_batching_simple(self):
         """
         Simple Recipients batching where 4 FCM Token gets batched as one
@@ -210,10 +292,66 @@ class TestNotificationOutbox(unittest.TestCase):
         batch = batched_recipients[0]
         self.assertEqual(batch.channel, self.channels.get_channel("FCM"))
         self.assertEqual(batch.channel_args, None)
-        self.assertTrue("user-0" in batch.channel_ids)
-        self.assertTrue("user-1" in batch.channel_ids)
-        self.assertCountEqual(batch.channel_ids["user-0"], ['random-token-0', 'random-token-1'])
-        self.assertCountEqual(batch.channel_ids["user-1"], ['random-token-2', 'random-token-3'])
+        self.assertEqual(len(batch.recipients), 4)
+        for idx, item in enumerate(batch.recipients):
+            self.assertIsInstance(item, RecipientsBatchItem)
+            self.assertEqual(item.outbox_row_name, d.recipients[idx].name)
+            self.assertEqual(item.channel_id, "random-token-{}".format(idx))
+            self.assertEqual(item.user_identifier, "user-{}".format(0 if idx < 2 else 1))
+
+    def test_recipients_batching_rules(self):
+        """
+        Batches are split by sender & channel_args, and never exceed the batch size
+        """
+        fcm_channel = self.channels.get_channel("FCM")
+
+        d = self.get_draft_outbox()
+        d.recipients = []
+        for i in range(5):
+            d.append("recipients", dict(
+                name="row-{}".format(i),
+                channel=fcm_channel,
+                channel_id="random-token-{}".format(i),
+                sender_type="Email Account" if i == 4 else None,
+                sender="sender-1" if i == 4 else None,
+            ))
+
+        with patch.object(d, "get_channel_batch_sizes", return_value={fcm_channel: 2}):
+            batched_recipients = d.get_batched_recipients()
+
+        self.assertEqual(
+            [[x.outbox_row_name for x in batch.recipients] for batch in batched_recipients],
+            [["row-0", "row-1"], ["row-2", "row-3"], ["row-4"]])
+        self.assertEqual(batched_recipients[-1].sender, "sender-1")
+        self.assertEqual(batched_recipients[-1].sender_type, "Email Account")
+
+    def test_recipients_batching_personalized(self):
+        """
+        Recipients with a content of their own are batched only with the ones with the same
+        """
+        fcm_channel = self.channels.get_channel("FCM")
+
+        d = self.get_draft_outbox()
+        d.recipients = []
+        for i in range(4):
+            d.append("recipients", dict(
+                name="row-{}".format(i),
+                channel=fcm_channel,
+                channel_id="random-token-{}".format(i),
+                subject="Hi A" if i < 2 else None,
+                content="Content A" if i < 2 else None,
+            ))
+
+        batched_recipients = d.get_batched_recipients()
+        self.assertEqual(
+            [[x.outbox_row_name for x in batch.recipients] for batch in batched_recipients],
+            [["row-0", "row-1"], ["row-2", "row-3"]])
+
+        params = _get_channel_handler_invoke_params(d, batched_recipients[0])
+        self.assertEqual((params.subject, params.content), ("Hi A", "Content A"))
+
+        params = _get_channel_handler_invoke_params(d, batched_recipients[1])
+        self.assertEqual((params.subject, params.content), (d.subject, d.content))
 
     def test_recipients_batching_mixed(self):
         """
@@ -343,6 +481,93 @@ class TestNotificationOutbox(unittest.TestCase):
         self.assertEqual(sms_handler.call_count, len([x for x in d.recipients if x.channel == self.channels.get_channel("SMS")]))  # noqa
         fcm_handler.assert_called_once()
 
+    def test_send_notifications_queue_routing(self):
+        """
+        Jobs are enqueued on the queue of the channel,
+        wrapped with run_channel_handler when the channel limits its concurrent jobs
+        """
+        sms_channel = self.channels.get_channel("SMS")
+        email_channel = self.channels.get_channel("Email")
+
+        d = self.get_draft_outbox()
+        d._channel_handlers = {
+            sms_channel: self.get_channel_handler(sms_channel),
+            email_channel: self.get_channel_handler(email_channel),
+        }
+        dispatch_settings = {
+            sms_channel: frappe._dict(queue="short", max_concurrent_jobs=0),
+            email_channel: frappe._dict(queue=None, max_concurrent_jobs=2),
+        }
+
+        d.before_submit()
+        with patch.object(d, "get_channel_dispatch_settings", return_value=dispatch_settings), \
+                patch("frappe.enqueue") as mock_enqueue:
+            d.send_pending_notifications()
+
+        self.assertEqual(mock_enqueue.call_count, len(d.recipients))
+        for call in mock_enqueue.call_args_list:
+            if call.kwargs.get("channel") == sms_channel:
+                self.assertEqual(call.kwargs.get("queue"), "short")
+                self.assertEqual(call.args[0], d._channel_handlers[sms_channel])
+            else:
+                self.assertEqual(call.kwargs.get("queue"), "default")
+                self.assertEqual(call.args[0], run_channel_handler)
+                self.assertEqual(call.kwargs.get("handler"), d._channel_handlers[email_channel])
+                self.assertEqual(call.kwargs.get("max_concurrent_jobs"), 2)
+
+    def test_run_channel_handler(self):
+        """
+        Recipients of a channel running its max_concurrent_jobs are deferred,
+        instead of waiting for a slot in the worker
+        """
+        from frappe_notification.utils.throttle import acquire_slot, release_slot
+
+        d = self.get_draft_outbox()
+        d.before_submit()
+        d.insert()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+        d.db_set("docstatus", 1)
+
+        row = d.recipients[0]
+        params = _get_channel_handler_invoke_params(d, row)
+        handler = MagicMock()
+
+        run_channel_handler(handler, max_concurrent_jobs=1, **params)
+        handler.assert_called_once_with(**params)
+
+        key = f"notification_channel:{row.channel}"
+        token = acquire_slot(key, limit=1, expires_in=60)
+        self.addCleanup(lambda: release_slot(key, token))
+
+        handler.reset_mock()
+        run_channel_handler(handler, max_concurrent_jobs=1, **params)
+        handler.assert_not_called()
+
+        row.reload()
+        self.assertEqual(NotificationOutboxStatus(row.status), NotificationOutboxStatus.PENDING)
+        self.assertEqual(row.attempts or 0, 0)
+        self.assertIsNotNone(row.next_attempt_on)
+
+    def test_get_dispatch_queue(self):
+        """
+        Priority lanes on top of the channel queues
+        """
+        d = self.get_draft_outbox()
+        with_queue = frappe._dict(queue="email")
+        without_queue = frappe._dict()
+
+        d.priority = NotificationPriority.HIGH.value
+        self.assertEqual(d.get_dispatch_queue(with_queue), "short")
+        self.assertEqual(d.get_dispatch_queue(without_queue), "short")
+
+        d.priority = NotificationPriority.NORMAL.value
+        self.assertEqual(d.get_dispatch_queue(with_queue), "email")
+        self.assertEqual(d.get_dispatch_queue(without_queue), "default")
+
+        d.priority = NotificationPriority.BULK.value
+        self.assertEqual(d.get_dispatch_queue(with_queue), "email")
+        self.assertEqual(d.get_dispatch_queue(without_queue), "long")
+
     def test_update_recipient_status(self):
         d = self.get_draft_outbox()
         d.before_submit()
@@ -381,6 +606,264 @@ class TestNotificationOutbox(unittest.TestCase):
         self.assertEqual(
             NotificationOutboxStatus(d.status), NotificationOutboxStatus.PARTIAL_SUCCESS)
 
+    def test_insert_recipients_in_bulk(self):
+        """
+        Recipients written with multi-row INSERTs should be identical to the ORM ones
+        """
+        d = self.get_draft_outbox()
+        recipients = [x.as_dict() for x in d.recipients]
+        d.recipients = []
+        d.insert()
+        self.outboxes.add_document(d)
+
+        d.BULK_INSERT_CHUNK_SIZE = 3  # Two chunks
+        d.insert_recipients_in_bulk([
+            dict(channel=x.channel, channel_id=x.channel_id, user_identifier="user-1")
+            for x in recipients
+        ])
+        self.assertEqual(len(d.recipients), len(recipients))
+
+        d.reload()
+        self.assertEqual(len(d.recipients), len(recipients))
+        for idx, row in enumerate(d.recipients):
+            self.assertEqual(row.idx, idx + 1)
+            self.assertEqual(row.channel, recipients[idx].channel)
+            self.assertEqual(row.channel_id, recipients[idx].channel_id)
+            self.assertEqual(row.user_identifier, "user-1")
+            self.assertEqual(row.docstatus, 0)
+
+    def test_submit_with_bulk_recipients(self):
+        """
+        flags.bulk_recipients are written & dispatched on submit
+        """
+        d = self.get_draft_outbox()
+        recipients = [
+            dict(channel=x.channel, channel_id=x.channel_id)
+            for x in d.recipients if x.channel == self.channels.get_channel("SMS")]
+        d.recipients = []
+        d.flags.bulk_recipients = recipients
+
+        sms_channel = self.channels.get_channel("SMS")
+        sms_handler = self.get_channel_handler(sms_channel)
+        # Please check frappe.call() implementation
+        sms_handler.fnargs = _get_channel_handler_invoke_params(d, frappe._dict()).keys()
+        d._channel_handlers = {sms_channel: sms_handler}
+        d._channel_batch_validators = {sms_channel: None}
+
+        d.submit()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+
+        self.assertEqual(d.pending_count, len(recipients))
+        self.assertEqual(frappe.db.count(
+            "Notification Outbox Recipient Item",
+            dict(parent=d.name, parenttype="Notification Outbox", docstatus=1,
+                 status=NotificationOutboxStatus.PENDING.value)), len(recipients))
+
+        # Once for validation, once for sending
+        self.assertEqual(sms_handler.call_count, 2 * len(recipients))
+
+    def test_update_outbox_recipient_status(self):
+        """
+        Row-level status updates without the Outbox document being loaded
+        """
+        d = self.get_draft_outbox()
+        d.before_submit()
+        d.insert()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+
+        # Drafts are left untouched
+        self.assertIsNone(update_outbox_recipient_status(
+            d.name, {d.recipients[0].name: NotificationOutboxStatus.SUCCESS}))
+
+        d.db_set("docstatus", 1)
+
+        # Non-existent rows do not update anything
+        self.assertIsNone(update_outbox_recipient_status(
+            d.name, dict(random_row=NotificationOutboxStatus.FAILED)))
+
+        status = update_outbox_recipient_status(
+            d.name, {d.recipients[0].name: NotificationOutboxStatus.SUCCESS})
+        self.assertEqual(NotificationOutboxStatus(status), NotificationOutboxStatus.PENDING)
+        self.assertEqual(frappe.db.get_value(
+            "Notification Outbox Recipient Item", d.recipients[0].name, "status"),
+            NotificationOutboxStatus.SUCCESS.value)
+        self.assertIsNotNone(frappe.db.get_value(
+            "Notification Outbox Recipient Item", d.recipients[0].name, "time_sent"))
+
+        # Same status again is a no-op
+        self.assertIsNone(update_outbox_recipient_status(
+            d.name, {d.recipients[0].name: NotificationOutboxStatus.SUCCESS}))
+
+        status = update_outbox_recipient_status(d.name, {
+            r.name: NotificationOutboxStatus.FAILED
+            for r in d.recipients[1:]
+        })
+        self.assertEqual(
+            NotificationOutboxStatus(status), NotificationOutboxStatus.PARTIAL_SUCCESS)
+        self.assertEqual(
+            frappe.db.get_value("Notification Outbox", d.name, "status"),
+            NotificationOutboxStatus.PARTIAL_SUCCESS.value)
+
+        # Only the rows sent successfully are logged
+        logs = frappe.get_all(
+            "Notification Recipient Log", dict(outbox=d.name),
+            ["name", "notification_client", "user_identifier", "channel_id", "time_sent"])
+        self.assertEqual([x.name for x in logs], [d.recipients[0].name])
+        self.assertEqual(logs[0].notification_client, d.notification_client)
+        self.assertEqual(logs[0].user_identifier, d.recipients[0].user_identifier)
+        self.assertEqual(logs[0].channel_id, d.recipients[0].channel_id)
+        self.assertIsNotNone(logs[0].time_sent)
+
+    def test_outbox_status_counters(self):
+        """
+        Counters on the Outbox track every status transition of its rows
+        """
+        d = self.get_draft_outbox()
+        d.before_submit()
+        d.insert()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+
+        d.db_set("docstatus", 1)
+
+        def _assert_counters(pending, success, failed):
+            counters = frappe.db.get_value(
+                "Notification Outbox", d.name,
+                ["pending_count", "success_count", "failed_count"], as_dict=1)
+            self.assertEqual((counters.pending_count, counters.success_count,
+                              counters.failed_count), (pending, success, failed))
+            self.assertEqual((d.pending_count, d.success_count, d.failed_count),
+                             (pending, success, failed))
+
+        n = len(d.recipients)
+        _assert_counters(n, 0, 0)
+
+        d.update_recipient_status({d.recipients[0].name: NotificationOutboxStatus.SUCCESS})
+        _assert_counters(n - 1, 1, 0)
+        self.assertEqual(NotificationOutboxStatus(d.status), NotificationOutboxStatus.PENDING)
+
+        d.update_recipient_status({
+            r.name: NotificationOutboxStatus.FAILED
+            for r in d.recipients
+        })
+        _assert_counters(0, 0, n)
+        self.assertEqual(NotificationOutboxStatus(d.status), NotificationOutboxStatus.FAILED)
+
+        d.update_recipient_status({d.recipients[0].name: NotificationOutboxStatus.SUCCESS})
+        _assert_counters(0, 1, n - 1)
+        self.assertEqual(
+            NotificationOutboxStatus(d.status), NotificationOutboxStatus.PARTIAL_SUCCESS)
+
+    def test_retry_failed_recipients(self):
+        """
+        Failed rows stay Pending till the channel runs out of attempts
+        """
+        d = self.get_draft_outbox()
+        d.before_submit()
+        d.insert()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+
+        d.db_set("docstatus", 1)
+        row = d.recipients[0]
+        n = len(d.recipients)
+
+        with patch(
+                "frappe_notification.frappe_notification.doctype.notification_outbox."
+                "notification_outbox._get_channel_retry_settings",
+                return_value={row.channel: (3, 60)}):
+            d.update_recipient_status({row.name: NotificationOutboxStatus.FAILED})
+            self.assertEqual(NotificationOutboxStatus(row.status), NotificationOutboxStatus.PENDING)
+            self.assertEqual(row.attempts, 1)
+            self.assertIsNotNone(row.next_attempt_on)
+            self.assertEqual(NotificationOutboxStatus(d.status), NotificationOutboxStatus.PENDING)
+            self.assertEqual(d.pending_count, n)
+
+            d.update_recipient_status({row.name: NotificationOutboxStatus.FAILED})
+            self.assertEqual(NotificationOutboxStatus(row.status), NotificationOutboxStatus.PENDING)
+            self.assertEqual(row.attempts, 2)
+
+            # Out of attempts
+            d.update_recipient_status({row.name: NotificationOutboxStatus.FAILED})
+            self.assertEqual(NotificationOutboxStatus(row.status), NotificationOutboxStatus.FAILED)
+            self.assertEqual(row.attempts, 3)
+            self.assertIsNone(row.next_attempt_on)
+            self.assertEqual((d.pending_count, d.failed_count), (n - 1, 1))
+
+    def test_dispatch_due_retries(self):
+        d = self.get_draft_outbox()
+        d.before_submit()
+        d.insert()
+        self.addCleanup(lambda: d.cancel() and d.delete())
+
+        d.db_set("docstatus", 1)
+        due_row, later_row = d.recipients[0], d.recipients[1]
+        frappe.db.set_value(
+            "Notification Outbox Recipient Item", due_row.name,
+            "next_attempt_on", frappe.utils.add_to_date(None, minutes=-1))
+        frappe.db.set_value(
+            "Notification Outbox Recipient Item", later_row.name,
+            "next_attempt_on", frappe.utils.add_to_date(None, minutes=10))
+
+        dispatched = []
+
+        def _send_pending_notifications(outbox: NotificationOutbox):
+            self.assertEqual(outbox.name, d.name)
+            self.assertEqual(outbox.subject, d.subject)
+            dispatched.extend([x.name for x in outbox.recipients])
+
+        with patch.object(
+                NotificationOutbox, "send_pending_notifications", _send_pending_notifications):
+            dispatch_due_retries()
+
+        self.assertEqual(dispatched, [due_row.name])
+        self.assertIsNone(frappe.db.get_value(
+            "Notification Outbox Recipient Item", due_row.name, "next_attempt_on"))
+        self.assertIsNotNone(frappe.db.get_value(
+            "Notification Outbox Recipient Item", later_row.name, "next_attempt_on"))
+
+    def test_get_retry_delay(self):
+        for attempt, delay in [(1, 60), (2, 120), (3, 240)]:
+            self.assertTrue(delay / 2 <= get_retry_delay(60, attempt) <= delay)
+
+        # Capped
+        self.assertLessEqual(get_retry_delay(60, 100), 24 * 60 * 60)
+
+    def test_store_contents(self):
+        """
+        Identical contents are stored once, & referenced by their hash
+        """
+        outboxes = []
+        for i in range(2):
+            d = self.get_draft_outbox()
+            d.subject = "Daily Broadcast"
+            d.content = "Same for everyone"
+            d.recipients[0].subject = "Personalized"
+            d.before_submit()
+            outboxes.append(d)
+
+        a, b = outboxes
+        self.assertIsNotNone(a.content_hash)
+        self.assertEqual(a.content_hash, b.content_hash)
+        self.assertIsNone(a.subject)
+        self.assertIsNone(a.content)
+        self.assertEqual(
+            frappe.db.count("Notification Content", dict(name=a.content_hash)), 1)
+
+        self.assertEqual(
+            a.get_content(),
+            dict(subject="Daily Broadcast", content="Same for everyone"))
+
+        # Outbox Items without contents of their own go with the one of the Outbox
+        self.assertIsNotNone(a.recipients[0].content_hash)
+        self.assertIsNone(a.recipients[1].content_hash)
+
+        params = _get_channel_handler_invoke_params(a, a.recipients[0])
+        self.assertEqual(
+            (params.subject, params.content), ("Personalized", "Same for everyone"))
+
+        params = _get_channel_handler_invoke_params(a, a.recipients[1])
+        self.assertEqual(
+            (params.subject, params.content), ("Daily Broadcast", "Same for everyone"))
+
     def get_draft_outbox(self):
         d = NotificationOutbox(dict(
             doctype="Notification Outbox",
@@ -15,3 +15,8 @@ class NotificationOutboxRecipientItem(Document):
     sender_type: str
     sender: str
     seen: int
+    attempts: int
+    next_attempt_on: str
+    subject: str
+    content: str
+    content_hash: str
@@ -0,0 +1 @@
+from .notification_recipient_log import NotificationRecipientLog, get_unread_count, insert_recipient_logs, mark_recipient_logs_seen  # noqa
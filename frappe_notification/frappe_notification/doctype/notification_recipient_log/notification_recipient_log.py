@@ -0,0 +1,260 @@
+# Copyright (c) 2022, Leam Technology Systems and contributors
+# For license information, please see license.txt
+
+import hashlib
+from typing import Dict, List, Optional
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+from frappe_notification.utils.counters import get_counter, incr_counters_after_commit
+
+# channel_id is a TEXT column, only its prefix can be indexed
+CHANNEL_ID_INDEX_LENGTH = 64
+
+# Seconds an unread count is kept in redis, from when it is counted in the db
+# Bounds the drift of a count rebuilt while the logs counted are being committed
+UNREAD_COUNT_TTL = 60 * 60
+
+
+class NotificationRecipientLog(Document):
+    """
+    Append-only projection of the Outbox Items sent successfully, for the Notification Logs
+    (inbox) of the recipients. Carries everything the logs are read & filtered with, so that they
+    are read from this table alone, without joining the Outboxes
+
+    Named after the Outbox Item it is written for. Check insert_recipient_logs
+
+    The unread counts of the recipients, by user_identifier & by (channel, channel_id), are kept
+    in redis & updated once the logs written & seen are committed. Check get_unread_count
+    """
+    notification_client: str
+    outbox: str
+    outbox_creation: str
+    user_identifier: str
+    channel: str
+    channel_id: str
+    time_sent: str
+    seen: int
+    content_hash: str
+    outbox_content_hash: str
+
+
+def on_doctype_update():
+    frappe.db.add_index(
+        "Notification Recipient Log", ["notification_client", "user_identifier", "outbox_creation"],
+        index_name="client_user_identifier_creation_index")
+    frappe.db.add_index(
+        "Notification Recipient Log",
+        ["notification_client", "channel", f"channel_id({CHANNEL_ID_INDEX_LENGTH})",
+         "outbox_creation"],
+        index_name="client_channel_channel_id_creation_index")
+
+
+def insert_recipient_logs(row_names: List[str]):
+    """
+    Writes the logs of the Outbox Items that are in Success, with a single INSERT .. SELECT
+    Items already logged are skipped
+    """
+    if not row_names:
+        return
+
+    new_logs = frappe.db.sql("""
+    SELECT
+        recipient_item.name,
+        outbox.notification_client,
+        recipient_item.user_identifier,
+        recipient_item.channel,
+        recipient_item.channel_id,
+        recipient_item.seen
+    FROM `tabNotification Outbox Recipient Item` recipient_item
+    JOIN `tabNotification Outbox` outbox
+        ON outbox.name = recipient_item.parent
+    LEFT JOIN `tabNotification Recipient Log` log
+        ON log.name = recipient_item.name
+    WHERE
+        recipient_item.name IN %(row_names)s
+        AND recipient_item.parenttype = 'Notification Outbox'
+        AND recipient_item.status = 'Success'
+        AND outbox.docstatus = 1
+        AND log.name IS NULL
+    """, dict(row_names=list(row_names)), as_dict=1)
+    if not new_logs:
+        return
+
+    now = now_datetime()
+    frappe.db.sql("""
+    INSERT IGNORE INTO `tabNotification Recipient Log` (
+        name, owner, modified_by, creation, modified, docstatus,
+        notification_client, outbox, outbox_creation,
+        user_identifier, channel, channel_id, time_sent, seen,
+        content_hash, outbox_content_hash
+    )
+    SELECT
+        recipient_item.name, %(user)s, %(user)s, %(now)s, %(now)s, 0,
+        outbox.notification_client, outbox.name, outbox.creation,
+        recipient_item.user_identifier, recipient_item.channel, recipient_item.channel_id,
+        recipient_item.time_sent, recipient_item.seen,
+        recipient_item.content_hash, outbox.content_hash
+    FROM `tabNotification Outbox Recipient Item` recipient_item
+    JOIN `tabNotification Outbox` outbox
+        ON outbox.name = recipient_item.parent
+    WHERE
+        recipient_item.name IN %(row_names)s
+        AND recipient_item.parenttype = 'Notification Outbox'
+        AND recipient_item.status = 'Success'
+        AND outbox.docstatus = 1
+    """, dict(user=frappe.session.user, now=now, row_names=[x.name for x in new_logs]))
+
+    _update_unread_counts([x for x in new_logs if not x.seen], 1)
+
+
+def mark_recipient_logs_seen(
+        row_names: Optional[List[str]] = None,
+        client: Optional[str] = None,
+        outboxes: Optional[List[str]] = None,
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None,
+        until: Optional[str] = None) -> int:
+    """
+    Marks the unseen logs matching all the filters given as seen, along with their Outbox Items,
+    with a single UPDATE. The unread counts are updated accordingly
+    - row_names: The logs, named after their Outbox Items
+    - outboxes: The logs of these Outboxes
+    - until: The logs of the Outboxes created at or before this
+    - user_identifier / channel & channel_id: The logs of this recipient
+
+    Returns the number of logs that were unseen till now
+    """
+    conditions = ["log.seen = 0"]
+    values = dict()
+    if row_names:
+        conditions.append("log.name IN %(row_names)s")
+        values["row_names"] = list(row_names)
+    if client:
+        conditions.append("log.notification_client = %(client)s")
+        values["client"] = client
+    if outboxes:
+        conditions.append("log.outbox IN %(outboxes)s")
+        values["outboxes"] = list(outboxes)
+    if user_identifier:
+        conditions.append("log.user_identifier = %(user_identifier)s")
+        values["user_identifier"] = user_identifier
+    if channel and channel_id:
+        conditions.append("log.channel = %(channel)s AND log.channel_id = %(channel_id)s")
+        values.update(channel=channel, channel_id=channel_id)
+    if until:
+        conditions.append("log.outbox_creation <= %(until)s")
+        values["until"] = until
+
+    if not (row_names or outboxes or until):
+        # Not everything, ever
+        return 0
+
+    conditions = " AND ".join(conditions)
+
+    # The unread counts the logs are in, locked till they are updated
+    unseen_counts = frappe.db.sql(f"""
+    SELECT
+        log.notification_client,
+        log.user_identifier,
+        log.channel,
+        log.channel_id,
+        COUNT(*) as count
+    FROM `tabNotification Recipient Log` log
+    WHERE {conditions}
+    GROUP BY log.notification_client, log.user_identifier, log.channel, log.channel_id
+    FOR UPDATE
+    """, values, as_dict=1)
+    if not unseen_counts:
+        return 0
+
+    frappe.db.sql(f"""
+    UPDATE `tabNotification Recipient Log` log
+    LEFT JOIN `tabNotification Outbox Recipient Item` recipient_item
+        ON recipient_item.name = log.name
+    SET
+        log.seen = 1,
+        recipient_item.seen = 1
+    WHERE {conditions}
+    """, values)
+
+    _update_unread_counts(unseen_counts, -1)
+
+    return sum(x.count for x in unseen_counts)
+
+
+def get_unread_count(
+        client: str,
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None) -> int:
+    """
+    Number of logs of the recipient that are not seen yet
+    Served from redis, counted in the db only when missing there
+    """
+    conditions = dict(notification_client=client, seen=0)
+    if user_identifier:
+        conditions.update(user_identifier=user_identifier)
+    else:
+        conditions.update(channel=channel, channel_id=channel_id)
+
+    return get_counter(
+        get_unread_count_key(client, user_identifier, channel, channel_id),
+        lambda: frappe.db.count("Notification Recipient Log", conditions),
+        UNREAD_COUNT_TTL)
+
+
+def get_unread_count_key(
+        client: str,
+        user_identifier: Optional[str] = None,
+        channel: Optional[str] = None,
+        channel_id: Optional[str] = None) -> str:
+    if user_identifier:
+        return f"frappe_notification:unread_count:{client}:user:{user_identifier}"
+
+    # channel_ids could be long, like device tokens
+    channel_id = hashlib.sha1(frappe.safe_encode(channel_id or "")).hexdigest()
+    return f"frappe_notification:unread_count:{client}:channel:{channel}:{channel_id}"
+
+
+def _update_unread_counts(logs: List[frappe._dict], delta: int):
+    deltas: Dict[str, int] = dict()
+    for log in logs:
+        keys = [get_unread_count_key(
+            log.notification_client, channel=log.channel, channel_id=log.channel_id)]
+        if log.user_identifier:
+            keys.append(get_unread_count_key(log.notification_client, log.user_identifier))
+
+        for key in keys:
+            deltas[key] = deltas.get(key, 0) + delta * log.get("count", 1)
+
+    incr_counters_after_commit(deltas)
+
+
+def delete_recipient_logs(outbox: str):
+    """
+    Deletes the logs of the Outbox, taking its unseen ones off the unread counts
+    """
+    # The unread counts the logs are in, locked till they are deleted
+    unseen_counts = frappe.db.sql("""
+    SELECT
+        log.notification_client,
+        log.user_identifier,
+        log.channel,
+        log.channel_id,
+        COUNT(*) as count
+    FROM `tabNotification Recipient Log` log
+    WHERE log.outbox = %(outbox)s AND log.seen = 0
+    GROUP BY log.notification_client, log.user_identifier, log.channel, log.channel_id
+    FOR UPDATE
+    """, dict(outbox=outbox), as_dict=1)
+
+    frappe.db.sql("""
+    DELETE FROM `tabNotification Recipient Log`
+    WHERE outbox = %(outbox)s
+    """, dict(outbox=outbox))
+
+    _update_unread_counts(unseen_counts, -1)
@@ -1,2 +1,2 @@
-from .notification_template import NotificationTemplate, NotificationRecipientItem  # noqa
+from .notification_template import NotificationTemplate, NotificationRecipientItem, TEMPLATE_KEYS_CACHE_KEY, clear_template_key_cache, queue_notifications  # noqa
 from .test_notification_template import NotificationTemplateFixtures  # noqa
@@ -1,7 +1,7 @@
 # Copyright (c) 2022, Leam Technology Systems and contributors
 # For license information, please see license.txt
 
-from typing import List
+from typing import List, Optional, Tuple
 
 import frappe
 from frappe.model.document import Document
@@ -9,11 +9,17 @@ from frappe.utils import now_datetime
 
 from frappe_notification import (
     get_active_notification_client,
-    NotificationChannel,
+    get_channel_config,
     NotificationOutbox,
+    NotificationOutboxStatus,
+    NotificationPriority,
     FrappeNotificationException,
     NotificationClientNotFound,
-    NotificationChannelNotFound)
+    NotificationChannelNotFound,
+    ValidationError,
+    set_active_notification_client)
+from frappe_notification.utils.template_cache import (
+    get_cached_template, invalidate_template_cache, render_template)
 
 from ..notification_client_item.notification_client_item import NotificationClientItem
 from ..notification_template_sender_item.notification_template_sender_item import \
@@ -22,11 +28,17 @@ from ..notification_template_language_item.notification_template_language_item i
     NotificationTemplateLanguageItem
 
 
+# (client, key) -> template resolutions of get_cached_target_template, in a redis hash
+TEMPLATE_KEYS_CACHE_KEY = "frappe_notification:template_keys"
+
+
 class NotificationRecipientItem(frappe._dict):
     channel: str
     channel_id: str
     channel_args: str
     user_identifier: str
+    # Overlaid on the send context, to personalize the notification for this recipient
+    context: dict
 
 
 class OnlyManagerTemplatesCanBeShared(FrappeNotificationException):
@@ -63,6 +75,7 @@ class NotificationTemplate(Document):
     content: str
     is_fork_of: str
     lang: str
+    priority: str
     last_used_on: str
     last_used_by: str
     created_by: str
@@ -70,6 +83,12 @@ class NotificationTemplate(Document):
     lang_templates: List[NotificationTemplateLanguageItem]
     channel_senders: List[NotificationTemplateSenderItem]
 
+    # Sends to at least these many recipients write the Outbox Items in bulk
+    BULK_INSERT_THRESHOLD = 500
+
+    # Seconds between the updates of last_used_on, for the same client
+    LAST_USED_INTERVAL = 60
+
     def autoname(self):
         """
         - Client name already includes manager name
@@ -91,6 +110,14 @@ class NotificationTemplate(Document):
         self.validate_allowed_clients()
         self.validate_language_templates()
 
+    def on_update(self):
+        invalidate_template_cache((self.name,))
+        clear_template_key_cache()
+
+    def on_trash(self):
+        invalidate_template_cache((self.name,))
+        clear_template_key_cache()
+
     def fork(self) -> "NotificationTemplate":
         """
         - Validate & Fork
@@ -210,14 +237,72 @@ class NotificationTemplate(Document):
     def send_notification(
             self,
             context: dict,
-            recipients: List[NotificationRecipientItem]) -> NotificationOutbox:
+            recipients: List[NotificationRecipientItem],
+            bulk_insert: Optional[bool] = None,
+            outbox: Optional[NotificationOutbox] = None,
+            priority: Optional[str] = None,
+            idempotency_key: Optional[str] = None) -> NotificationOutbox:
         """
         Create Notification Outbox Document which will manage and track the procedure
+        - bulk_insert: Write the Outbox Items with multi-row INSERTs.
+                       Decided by BULK_INSERT_THRESHOLD when not specified
+        - outbox: A draft Outbox to be filled in & submitted, instead of making a new one
+        - priority: High, Normal or Bulk. Priority of the template when not specified
+        - idempotency_key: Set on the Outbox. Unique for the client, check get_idempotent_outbox
+
+        Recipients with a context of their own get the templates rendered with it overlaid on
+        `context`. Their subject & content are stored on their Outbox Item, when different
+        from the ones of the Outbox
         """
         # Blow the templates!
-        subject, content = self.get_lang_templates(context.get("lang") or self.lang)
-        subject = frappe.render_template(subject, context)
-        content = frappe.render_template(content, context)
+        subject, content = self.render_templates(context)
+        outbox_recipients = self.get_outbox_recipients(context, recipients, subject, content)
+
+        if bulk_insert is None:
+            bulk_insert = len(outbox_recipients) >= self.BULK_INSERT_THRESHOLD
+
+        outbox_values = dict(
+            subject=subject,
+            content=content,
+            notification_client=get_active_notification_client(),
+            notification_template=self.name,
+            priority=self.get_priority(priority),
+            recipients=[] if bulk_insert else outbox_recipients,
+            queued_args=None,
+        )
+        if idempotency_key:
+            outbox_values["idempotency_key"] = idempotency_key
+
+        if outbox:
+            outbox.update(outbox_values)
+        else:
+            outbox = frappe.get_doc(dict(doctype="Notification Outbox", **outbox_values))
+
+        if bulk_insert:
+            outbox.flags.bulk_recipients = outbox_recipients
+
+        outbox.docstatus = 1
+        if outbox.is_new():
+            outbox.insert(ignore_permissions=True)
+        else:
+            outbox.save(ignore_permissions=True)
+
+        self.update_last_used()
+
+        return outbox
+
+    def get_outbox_recipients(
+            self,
+            context: dict,
+            recipients: List[NotificationRecipientItem],
+            subject: str,
+            content: str) -> List[dict]:
+        """
+        The Outbox Items of the recipients, with their senders & channel_args resolved
+        subject & content are the ones rendered for the Outbox. The Items get a subject & content
+        of their own only when different
+        """
+        recipient_templates = self.render_recipient_templates(context, recipients)
 
         _sender_info = dict()
         _ctx_channel_args = context.get("channel_args", "{}")
@@ -246,32 +331,179 @@ class NotificationTemplate(Document):
 
             return args
 
-        outbox = frappe.get_doc(dict(
+        return [
+            dict(
+                channel=x.get("channel"),
+                channel_id=x.get("channel_id"),
+                channel_args=_get_channel_args(x),
+                user_identifier=x.get("user_identifier"),
+                sender_type=_get_sender(x.get("channel"))[0],
+                sender=_get_sender(x.get("channel"))[1],
+                subject=_subject if _subject != subject else None,
+                content=_content if _content != content else None,
+            )
+            for x, (_subject, _content) in zip(recipients, recipient_templates)
+        ]
+
+    def begin_notification(
+            self,
+            context: dict,
+            priority: Optional[str] = None,
+            idempotency_key: Optional[str] = None) -> NotificationOutbox:
+        """
+        Makes a Draft Outbox, for the recipients to be appended in chunks afterwards
+        The templates are rendered right away, the context is kept on the Outbox to render
+        the ones of the recipients with a context of their own. Check append_notification_recipients
+        """
+        subject, content = self.render_templates(context)
+        outbox: NotificationOutbox = frappe.get_doc(dict(
             doctype="Notification Outbox",
+            status=NotificationOutboxStatus.DRAFT.value,
             subject=subject,
             content=content,
             notification_client=get_active_notification_client(),
-            recipients=[
-                dict(
-                    channel=x.get("channel"),
-                    channel_id=x.get("channel_id"),
-                    channel_args=_get_channel_args(x),
-                    user_identifier=x.get("user_identifier"),
-                    sender_type=_get_sender(x.get("channel"))[0],
-                    sender=_get_sender(x.get("channel"))[1],
-                )
-                for x in recipients
-            ]
+            notification_template=self.name,
+            priority=self.get_priority(priority),
+            idempotency_key=idempotency_key or None,
+            queued_args=frappe.as_json(dict(context=context), indent=None),
         ))
+        outbox.store_contents()
+        outbox.insert(ignore_permissions=True)
 
-        outbox.docstatus = 1
+        self.update_last_used()
+
+        return outbox
+
+    def append_notification_recipients(
+            self,
+            outbox: NotificationOutbox,
+            recipients: List[NotificationRecipientItem]):
+        """
+        Renders & appends a chunk of recipients to a Draft Outbox made by begin_notification
+        The outbox is expected to be loaded without its Items: get_outbox_without_recipients
+        """
+        context = frappe.parse_json(outbox.queued_args or "{}").get("context") or dict()
+        outbox_content = outbox.get_content()
+        outbox.append_recipients(self.get_outbox_recipients(
+            context, recipients, outbox_content.subject, outbox_content.content))
+
+    def queue_notification(
+            self,
+            context: dict,
+            recipients: List[NotificationRecipientItem],
+            priority: Optional[str] = None,
+            idempotency_key: Optional[str] = None) -> NotificationOutbox:
+        """
+        Persist the send request as a Queued Outbox and return right away.
+        Rendering, validations & dispatch happens in a background job: send_queued_notification
+        """
+        outbox = frappe.get_doc(dict(
+            doctype="Notification Outbox",
+            status=NotificationOutboxStatus.QUEUED.value,
+            notification_client=get_active_notification_client(),
+            notification_template=self.name,
+            priority=self.get_priority(priority),
+            idempotency_key=idempotency_key or None,
+            queued_args=frappe.as_json(dict(context=context, recipients=recipients), indent=None),
+        ))
         outbox.insert(ignore_permissions=True)
 
-        self.db_set("last_used_on", now_datetime())
-        self.db_set("last_used_by", get_active_notification_client())
+        frappe.enqueue(
+            send_queued_notification,
+            queue=outbox.get_dispatch_queue(frappe._dict()),
+            outbox=outbox.name,
+            enqueue_after_commit=True,
+            now=frappe.flags.in_test,
+        )
 
         return outbox
 
+    def update_last_used(self):
+        """
+        Sets last_used_on & last_used_by, at most once every LAST_USED_INTERVAL for the same client
+        Written directly, so that `modified` & the cached document stay untouched.
+        The compiled templates are cached against `modified`
+        """
+        client = get_active_notification_client()
+        throttle_key = f"frappe_notification:template_last_used:{self.name}:{client}"
+        if frappe.cache().get_value(throttle_key):
+            return
+
+        self.last_used_on = now_datetime()
+        self.last_used_by = client
+        frappe.db.sql("""
+        UPDATE `tabNotification Template`
+        SET
+            last_used_on = %(last_used_on)s,
+            last_used_by = %(last_used_by)s
+        WHERE
+            name = %(name)s
+        """, dict(last_used_on=self.last_used_on, last_used_by=client, name=self.name))
+        frappe.cache().set_value(throttle_key, 1, expires_in_sec=self.LAST_USED_INTERVAL)
+
+    def get_priority(self, priority: Optional[str] = None) -> str:
+        """
+        Priority of a send. Falls back to the priority of the template
+        """
+        priority = priority or self.priority or NotificationPriority.NORMAL.value
+        if priority not in [x.value for x in NotificationPriority]:
+            raise ValidationError(frappe._("Invalid Priority: {0}").format(priority))
+
+        return priority
+
+    def render_templates(self, context: dict) -> Tuple[str, str]:
+        """
+        Renders the subject & content in the language of the context
+        """
+        subject, content = self.get_compiled_templates(context.get("lang") or self.lang)
+        return (render_template(subject, context), render_template(content, context))
+
+    def render_recipient_templates(
+            self,
+            context: dict,
+            recipients: List[NotificationRecipientItem]) -> List[Tuple[str, str]]:
+        """
+        Renders the subject & content of each recipient, with its context overlaid on `context`
+        The templates are compiled once per language & rendered in a tight loop
+        Recipients without a context of their own get (None, None)
+        """
+        templates = dict()
+        rendered = []
+        for recipient in recipients:
+            overlay = recipient.get("context")
+            if not overlay:
+                rendered.append((None, None))
+                continue
+
+            if isinstance(overlay, str):
+                overlay = frappe.parse_json(overlay)
+
+            _context = {**context, **overlay}
+            lang = _context.get("lang") or self.lang
+            if lang not in templates:
+                templates[lang] = self.get_compiled_templates(lang)
+
+            subject, content = templates[lang]
+            rendered.append(
+                (render_template(subject, _context), render_template(content, _context)))
+
+        return rendered
+
+    def get_compiled_templates(self, lang: str):
+        """
+        Compiled Jinja templates of the subject & content of the language
+        They are cached by the template, language & modified timestamp
+        """
+        subject, content = self.get_lang_templates(lang)
+
+        # Not from the db when there is no modified, nothing to key the cache with
+        key = (self.name, lang, str(self.modified)) if self.modified else None
+
+        return (
+            get_cached_template(key and (*key, "subject"), subject),
+            get_cached_template(key and (*key, "content"), content),
+        )
+
     def get_lang_templates(self, lang: str):
         """
         Gets the templates (subject & content) defined for a particular language
@@ -293,7 +525,8 @@ class NotificationTemplate(Document):
         """
         Senders can be Email Account, Telegram Bot
         """
-        if not frappe.db.exists("Notification Channel", channel):
+        config = get_channel_config(channel)
+        if not config:
             raise NotificationChannelNotFound(channel=channel)
 
         # Search in the template itself
@@ -302,8 +535,7 @@ class NotificationTemplate(Document):
                 continue
             return (row.sender_type, row.sender)
 
-        channel: NotificationChannel = frappe.get_doc("Notification Channel", channel)
-        return (channel.sender_type, channel.default_sender)
+        return (config.sender_type, config.default_sender)
 
     def is_created_by_client_manager(self):
         """
@@ -315,3 +547,113 @@ class NotificationTemplate(Document):
             "is_client_manager") if self.created_by else False
 
         return bool(is_client_manager)
+
+
+def clear_template_key_cache():
+    frappe.cache().delete_value(TEMPLATE_KEYS_CACHE_KEY)
+
+
+def queue_notifications(sends: List[frappe._dict]) -> List[str]:
+    """
+    NotificationTemplate.queue_notification for many sends in one go
+    The Queued Outboxes are written with multi-row INSERTs & a single background job is enqueued
+    per dispatch queue, to submit all of its Outboxes: send_queued_notifications
+
+    args:
+        sends: [{ template: NotificationTemplate, context, recipients, priority, idempotency_key }]
+
+    Returns the names of the Outboxes, in the order of sends
+    """
+    now = now_datetime()
+    user = frappe.session.user
+    client = get_active_notification_client()
+    fields = [
+        "name", "owner", "creation", "modified", "modified_by", "docstatus", "status",
+        "notification_client", "notification_template", "priority", "idempotency_key",
+        "queued_args",
+    ]
+
+    outboxes = []
+    values = []
+    outboxes_by_queue = dict()
+    for send in sends:
+        outbox: NotificationOutbox = frappe.get_doc(dict(
+            doctype="Notification Outbox",
+            name=frappe.generate_hash("Notification Outbox", 10),
+            status=NotificationOutboxStatus.QUEUED.value,
+            notification_client=client,
+            notification_template=send.template.name,
+            priority=send.template.get_priority(send.priority),
+            # Empty keys would collide on unique_client_idempotency_key
+            idempotency_key=send.idempotency_key or None,
+        ))
+        queued_args = frappe.as_json(
+            dict(context=send.context, recipients=send.recipients), indent=None)
+
+        outboxes.append(outbox.name)
+        values.append((
+            outbox.name, user, now, now, user, 0, outbox.status,
+            outbox.notification_client, outbox.notification_template, outbox.priority,
+            outbox.idempotency_key, queued_args,
+        ))
+        outboxes_by_queue.setdefault(
+            outbox.get_dispatch_queue(frappe._dict()), []).append(outbox.name)
+
+    frappe.db.bulk_insert(
+        "Notification Outbox", fields, values,
+        chunk_size=NotificationOutbox.BULK_INSERT_CHUNK_SIZE)
+
+    for queue, queue_outboxes in outboxes_by_queue.items():
+        frappe.enqueue(
+            send_queued_notifications,
+            queue=queue,
+            outboxes=queue_outboxes,
+            enqueue_after_commit=True,
+            now=frappe.flags.in_test,
+        )
+
+    return outboxes
+
+
+def send_queued_notifications(outboxes: List[str]):
+    """
+    Background job of queue_notifications
+    """
+    for outbox in outboxes:
+        send_queued_notification(outbox)
+
+
+def send_queued_notification(outbox: str):
+    """
+    Background job of NotificationTemplate.queue_notification
+    Renders, validates & submits the Queued Outbox. Any errors are recorded on the Outbox
+    """
+    outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", outbox)
+    if outbox.docstatus != 0 or outbox.status != NotificationOutboxStatus.QUEUED.value:
+        return
+
+    args = frappe.parse_json(outbox.queued_args)
+    active_client = get_active_notification_client()
+    set_active_notification_client(outbox.notification_client)
+
+    frappe.db.savepoint("send_queued_notification")
+    try:
+        template: NotificationTemplate = frappe.get_doc(
+            "Notification Template", outbox.notification_template)
+        template.send_notification(
+            context=args.context or dict(),
+            recipients=args.recipients or [],
+            outbox=outbox,
+            priority=outbox.priority)
+    except BaseException as e:
+        frappe.db.rollback(save_point="send_queued_notification")
+
+        error = e.as_dict() if isinstance(e, FrappeNotificationException) else frappe._dict(
+            message=str(e), error_code="UNKNOWN_ERROR")
+
+        frappe.db.set_value("Notification Outbox", outbox.name, dict(
+            status=NotificationOutboxStatus.FAILED.value,
+            error=frappe.as_json(error),
+        ))
+    finally:
+        set_active_notification_client(active_client)
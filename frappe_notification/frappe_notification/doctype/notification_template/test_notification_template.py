@@ -16,6 +16,7 @@ from frappe_notification import (
     NotificationChannelFixtures,
     NotificationClientNotFound,
     set_active_notification_client)
+from frappe_notification.utils.template_cache import clear_template_cache, get_template_cache_info
 
 from .notification_template import (
     NotificationTemplate,
@@ -213,9 +214,47 @@ class TestNotificationTemplate(unittest.TestCase):
         # Now, for a lang for which template is not defined
         self.assertEqual(d.get_lang_templates("pr"), _lang_templates["en"])
 
+    def test_render_templates_cached(self):
+        """
+        Compiled templates are reused till the template is modified
+        """
+        clear_template_cache()
+        d = NotificationTemplate(dict(
+            doctype="Notification Template",
+            name=self.faker.first_name(),
+            modified="2022-11-10 10:00:00.000000",
+            lang="en",
+            subject="Hi {{ name }}",
+            content="Your OTP is {{ otp }}",
+            lang_templates=[
+                dict(lang="ar", subject="Ar Hi {{ name }}", content="Ar OTP {{ otp }}"),
+            ]))
+
+        self.assertEqual(
+            d.render_templates(dict(name="A", otp="1")), ("Hi A", "Your OTP is 1"))
+        self.assertEqual(get_template_cache_info().misses, 2)
+
+        self.assertEqual(
+            d.render_templates(dict(name="B", otp="2")), ("Hi B", "Your OTP is 2"))
+        self.assertEqual(get_template_cache_info().hits, 2)
+
+        # Languages are cached separately
+        self.assertEqual(
+            d.render_templates(dict(name="C", otp="3", lang="ar")), ("Ar Hi C", "Ar OTP 3"))
+        self.assertEqual(get_template_cache_info().misses, 4)
+
+        # Modified templates are compiled again
+        d.modified = "2022-11-10 11:00:00.000000"
+        d.subject = "Hello {{ name }}"
+        self.assertEqual(d.render_templates(dict(name="D", otp="4"))[0], "Hello D")
+        self.assertEqual(get_template_cache_info().misses, 6)
+
+        d.on_update()
+        self.assertEqual(get_template_cache_info().size, 0)
+
     @patch("frappe.model.document.Document.insert", spec=True)
-    @patch("frappe.model.document.Document.db_set", spec=True)
-    def test_send_notification_1(self, db_set_mock: MagicMock, mock_insert: MagicMock):
+    @patch.object(NotificationTemplate, "update_last_used")
+    def test_send_notification_1(self, last_used_mock: MagicMock, mock_insert: MagicMock):
         """
         Let's try sending out a simple OTP Notification to
         - EMail test@test.com
@@ -281,9 +320,10 @@ class TestNotificationTemplate(unittest.TestCase):
         self.assertIsNotNone(outbox)
         mock_insert.assert_called_once()
 
-        self.assertEqual(db_set_mock.call_count, 2)
-        self.assertIn("last_used_on", [x[0][0] for x in db_set_mock.call_args_list])
-        self.assertIn(("last_used_by", client), [x[0] for x in db_set_mock.call_args_list])
+        self.assertEqual(outbox.subject, f"Your Subject OTP is {_OTP}")
+        self.assertEqual(outbox.content, f"Your Content OTP is {_OTP}")
+
+        last_used_mock.assert_called_once()
 
         self.assertEqual(len(outbox.recipients), len(recipient_list))
         for i in range(len(recipient_list)):
@@ -314,6 +354,63 @@ class TestNotificationTemplate(unittest.TestCase):
                     self.assertIsInstance(outbox_row.channel_args, str)
                     self.assertEqual(frappe.parse_json(outbox_row.channel_args), sms_args)
 
+    @patch("frappe.model.document.Document.insert", spec=True)
+    @patch.object(NotificationTemplate, "update_last_used")
+    def test_send_notification_personalized(self, last_used_mock: MagicMock,
+                                            mock_insert: MagicMock):
+        """
+        Recipients with a context of their own get a notification rendered with it
+        """
+        set_active_notification_client(self.clients[0].name)
+        sms_channel = self.channels.get_channel("SMS")
+
+        d = NotificationTemplate(dict(
+            doctype="Notification Template",
+            key=self.faker.first_name(),
+            lang="en",
+            subject="Hi {{ name }}",
+            content="You owe {{ amount }}",
+            lang_templates=[
+                dict(lang="ar", subject="Ar Hi {{ name }}", content="Ar You owe {{ amount }}"),
+            ]))
+
+        outbox = d.send_notification(dict(name="there", amount=0), [
+            dict(channel=sms_channel, channel_id="+966 560440261", context=dict(name="A")),
+            dict(channel=sms_channel, channel_id="+966 560440262",
+                 context=dict(name="B", amount=20, lang="ar")),
+            dict(channel=sms_channel, channel_id="+966 560440263"),
+            # Renders the same as the Outbox
+            dict(channel=sms_channel, channel_id="+966 560440264", context=dict(amount=0)),
+        ])
+
+        self.assertEqual((outbox.subject, outbox.content), ("Hi there", "You owe 0"))
+        self.assertEqual(
+            [(x.subject, x.content) for x in outbox.recipients],
+            [("Hi A", None), ("Ar Hi B", "Ar You owe 20"), (None, None), (None, None)])
+
+    @patch("frappe.db.sql")
+    def test_update_last_used(self, sql_mock: MagicMock):
+        client = self.clients[0].name
+        set_active_notification_client(client)
+        d = NotificationTemplate(dict(
+            doctype="Notification Template", name=frappe.generate_hash(length=10)))
+
+        d.update_last_used()
+        sql_mock.assert_called_once()
+        self.assertEqual(sql_mock.call_args[0][1].get("last_used_by"), client)
+        self.assertEqual(sql_mock.call_args[0][1].get("name"), d.name)
+        self.assertEqual(d.last_used_by, client)
+
+        # Throttled within LAST_USED_INTERVAL, for the same client
+        d.update_last_used()
+        sql_mock.assert_called_once()
+
+        # Another client is recorded right away
+        set_active_notification_client(self.clients[1].name)
+        d.update_last_used()
+        self.assertEqual(sql_mock.call_count, 2)
+        self.assertEqual(d.last_used_by, self.clients[1].name)
+
     def test_validate_can_fork(self):
         d = NotificationTemplate(dict(
             doctype="Notification Template",
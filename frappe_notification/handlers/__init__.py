@@ -1,3 +1,3 @@
-from .sms import sms_handler  # noqa
+from .sms import sms_handler, sms_batch_validator  # noqa
 from .email import email_handler  # noqa
 from .fcm import fcm_handler  # noqa
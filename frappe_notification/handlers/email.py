@@ -1,5 +1,7 @@
 import frappe
-from frappe_notification import NotificationOutboxStatus, NotificationOutbox
+from frappe_notification import (
+    NotificationOutboxStatus, RateLimitExceeded, acquire_send_token, defer_outbox_recipients,
+    update_outbox_recipient_status)
 
 
 def email_handler(
@@ -33,8 +35,8 @@ def email_handler(
     if to_validate:
         return True
 
-    outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", outbox)
     try:
+        acquire_send_token(channel, sender_type, sender)
         if sender_type == "Email Account" and sender:
             sender = frappe.db.get_value("Email Account", sender, "email_id")
 
@@ -47,6 +49,8 @@ def email_handler(
                 delayed=False,
             )
 
-        outbox.update_recipient_status({outbox_row_name: NotificationOutboxStatus.SUCCESS})
+        update_outbox_recipient_status(outbox, {outbox_row_name: NotificationOutboxStatus.SUCCESS})
+    except RateLimitExceeded as e:
+        defer_outbox_recipients(outbox, [outbox_row_name], delay=e.data.retry_after)
     except BaseException:
-        outbox.update_recipient_status({outbox_row_name: NotificationOutboxStatus.FAILED})
+        update_outbox_recipient_status(outbox, {outbox_row_name: NotificationOutboxStatus.FAILED})
@@ -2,7 +2,9 @@ from typing import List
 import frappe
 
 from renovation_core.utils.fcm import _notify_via_fcm
-from frappe_notification import (NotificationOutbox, NotificationOutboxStatus, RecipientsBatchItem)
+from frappe_notification import (
+    NotificationOutboxStatus, RateLimitExceeded, RecipientsBatchItem, acquire_send_token,
+    defer_outbox_recipients, update_outbox_recipient_status)
 
 # FCM is a Batched Notification Channel
 
@@ -36,8 +38,8 @@ def fcm_handler(
         # TODO: We could make use of Firebase Library ?
         return True
 
-    outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", outbox)
     try:
+        acquire_send_token(channel, sender_type, sender)
         fcm_data = None
         if channel_args and "fcm_data" in channel_args:
             fcm_data = channel_args.get("fcm_data")
@@ -52,12 +54,15 @@ def fcm_handler(
                 tokens=tokens
             )
 
-        outbox.update_status({
+        update_outbox_recipient_status(outbox, {
             r.outbox_row_name: NotificationOutboxStatus.SUCCESS
             for r in recipients
         })
+    except RateLimitExceeded as e:
+        defer_outbox_recipients(
+            outbox, [r.outbox_row_name for r in recipients], delay=e.data.retry_after)
     except BaseException:
-        outbox.update_status({
+        update_outbox_recipient_status(outbox, {
             r.outbox_row_name: NotificationOutboxStatus.FAILED
             for r in recipients
         })
@@ -1,8 +1,13 @@
+from typing import Dict, List
+
 import frappe
 from frappe_notification import (
     FrappeNotificationException,
-    NotificationOutbox,
-    NotificationOutboxStatus)
+    NotificationOutboxStatus,
+    RateLimitExceeded,
+    acquire_send_token,
+    defer_outbox_recipients,
+    update_outbox_recipient_status)
 from renovation_core.utils.sms_setting import validate_receiver_nos, send_sms
 
 
@@ -42,19 +47,64 @@ def sms_handler(
         try:
             validate_receiver_nos([channel_id])
         except BaseException:
-            raise FrappeNotificationException(
-                message=frappe._("SMS Receiver number is invalid"),
-                error_code="INVALID_SMS_NUMBER",
-                data=frappe._dict(
-                    number=channel_id
-                ))
+            raise _get_invalid_sms_number_error(channel_id)
         return
 
-    outbox: NotificationOutbox = frappe.get_doc("Notification Outbox", outbox)
     try:
+        acquire_send_token(channel, sender_type, sender)
         if not frappe.flags.in_test:
             send_sms([channel_id], msg=content, success_msg=False)
 
-        outbox.update_recipient_status({outbox_row_name: NotificationOutboxStatus.SUCCESS})
+        update_outbox_recipient_status(outbox, {outbox_row_name: NotificationOutboxStatus.SUCCESS})
+    except RateLimitExceeded as e:
+        defer_outbox_recipients(outbox, [outbox_row_name], delay=e.data.retry_after)
     except BaseException:
-        outbox.update_recipient_status({outbox_row_name: NotificationOutboxStatus.FAILED})
+        update_outbox_recipient_status(outbox, {outbox_row_name: NotificationOutboxStatus.FAILED})
+
+
+def sms_batch_validator(
+    *,
+    # The channel selected, ie SMS
+    channel: str,
+    # Handler params of every SMS recipient, with to_validate=True
+    recipients: List[dict],
+    # If there is any extra arguments
+    **kwargs
+) -> Dict[int, FrappeNotificationException]:
+    """
+    Validates all the SMS recipients in one go
+    Returns the errors keyed by the index of the recipient
+    """
+    assert channel == "SMS"
+
+    if frappe.flags.in_test:
+        # No validations in_test
+        return dict()
+
+    # A single validate_receiver_nos for the whole batch. It stops at the first invalid number,
+    # so the numbers are checked one by one only when the batch has an invalid number
+    numbers = [r.get("channel_id") for r in recipients]
+    try:
+        validated = validate_receiver_nos(numbers)
+    except BaseException:
+        validated = None
+    if validated is not None and len(validated) == len(numbers):
+        return dict()
+
+    errors = dict()
+    for idx, number in enumerate(numbers):
+        try:
+            validate_receiver_nos([number])
+        except BaseException:
+            errors[idx] = _get_invalid_sms_number_error(number)
+
+    return errors
+
+
+def _get_invalid_sms_number_error(number: str):
+    return FrappeNotificationException(
+        message=frappe._("SMS Receiver number is invalid"),
+        error_code="INVALID_SMS_NUMBER",
+        data=frappe._dict(
+            number=number
+        ))
@@ -22,6 +22,11 @@ notification_channel_handler = {
     "FCM": "frappe_notification.handlers.fcm_handler",
 }
 
+# Optional. Validates all the recipients of a channel in a single call
+notification_channel_batch_validator = {
+    "SMS": "frappe_notification.handlers.sms_batch_validator",
+}
+
 # Includes in <head>
 # ------------------
 
@@ -113,6 +118,21 @@ notification_channel_handler = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "cron": {
+        "* * * * *": [
+            "frappe_notification.frappe_notification.doctype.notification_outbox."
+            "notification_outbox.dispatch_due_retries"
+        ]
+    },
+    "daily": [
+        "frappe_notification.frappe_notification.doctype.notification_outbox."
+        "notification_outbox.clear_expired_idempotency_keys",
+        "frappe_notification.frappe_notification.doctype.notification_outbox."
+        "notification_outbox.delete_stale_draft_outboxes",
+    ]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"frappe_notification.tasks.all"
@@ -131,6 +151,13 @@ notification_channel_handler = {
 # 	]
 # }
 
+# Caches
+# ------
+
+clear_cache = (
+    "frappe_notification.frappe_notification.doctype.notification_channel."
+    "notification_channel.clear_channel_cache")
+
 # Testing
 # -------
 
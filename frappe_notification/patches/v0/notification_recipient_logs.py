@@ -0,0 +1,59 @@
+import frappe
+
+from frappe_notification.frappe_notification.doctype.notification_content.notification_content \
+    import store_contents
+from frappe_notification.frappe_notification.doctype.notification_recipient_log \
+    import insert_recipient_logs
+
+BATCH_SIZE = 1000
+
+
+def execute():
+    # Patches run before the doctypes are synced. The backfill reads columns added since,
+    # like the content_hash of the Outbox Items
+    frappe.reload_doc("frappe_notification", "doctype", "notification_outbox_recipient_item")
+    frappe.reload_doc("frappe_notification", "doctype", "notification_outbox")
+    frappe.reload_doc("frappe_notification", "doctype", "notification_content")
+    frappe.reload_doc("frappe_notification", "doctype", "notification_recipient_log")
+
+    # The logs reference the contents. Outboxes sent before Notification Content have them inline
+    while True:
+        outboxes = frappe.db.sql("""
+        SELECT name, subject, content
+        FROM `tabNotification Outbox`
+        WHERE
+            docstatus = 1
+            AND content_hash IS NULL
+            AND (subject IS NOT NULL OR content IS NOT NULL)
+        LIMIT %(limit)s
+        """, dict(limit=BATCH_SIZE), as_dict=1)
+        if not outboxes:
+            break
+
+        content_hashes = store_contents([(x.subject, x.content) for x in outboxes])
+        for outbox, content_hash in zip(outboxes, content_hashes):
+            frappe.db.set_value(
+                "Notification Outbox", outbox.name, "content_hash", content_hash,
+                update_modified=False)
+
+        frappe.db.commit()
+
+    # Backfill the logs of the rows already sent, batch by batch
+    last_name = ""
+    while True:
+        row_names = frappe.db.sql_list("""
+        SELECT name
+        FROM `tabNotification Outbox Recipient Item`
+        WHERE
+            parenttype = 'Notification Outbox'
+            AND status = 'Success'
+            AND name > %(last_name)s
+        ORDER BY name
+        LIMIT %(limit)s
+        """, dict(last_name=last_name, limit=BATCH_SIZE))
+        if not row_names:
+            break
+
+        insert_recipient_logs(row_names)
+        frappe.db.commit()
+        last_name = row_names[-1]
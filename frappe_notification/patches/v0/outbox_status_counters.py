@@ -0,0 +1,25 @@
+import frappe
+
+
+def execute():
+    frappe.reload_doc("frappe_notification", "doctype", "notification_outbox")
+
+    # Backfill the per-status counters of existing Outboxes
+    frappe.db.sql("""
+    UPDATE
+        `tabNotification Outbox` outbox
+    JOIN (
+        SELECT
+            parent,
+            SUM(status = 'Pending') AS pending_count,
+            SUM(status = 'Success') AS success_count,
+            SUM(status = 'Failed') AS failed_count
+        FROM `tabNotification Outbox Recipient Item`
+        WHERE parenttype = 'Notification Outbox'
+        GROUP BY parent
+    ) counters ON counters.parent = outbox.name
+    SET
+        outbox.pending_count = counters.pending_count,
+        outbox.success_count = counters.success_count,
+        outbox.failed_count = counters.failed_count
+    """)
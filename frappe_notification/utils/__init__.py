@@ -2,7 +2,7 @@ from functools import wraps
 
 
 import frappe
-from .client import get_active_notification_client, set_active_notification_client  # noqa
+from .client import get_active_notification_client, get_active_notification_client_info, set_active_notification_client  # noqa
 from .exceptions import *  # noqa
 
 
@@ -28,8 +28,8 @@ def frappe_notification_api(only_client_managers=False, allow_non_clients=False)
                 client: str = get_active_notification_client()
                 if not allow_non_clients and not client:
                     raise NotificationClientNotFound()
-                if only_client_managers and not frappe.db.get_value(
-                        "Notification Client", client, "is_client_manager"):
+                if only_client_managers and not (
+                        client and get_active_notification_client_info().is_client_manager):
                     raise ActionRestrictedToClientManager()
 
                 kwargs.pop("cmd", None)
@@ -1,9 +1,17 @@
+import hashlib
+import hmac
+
 import frappe
-from typing import Union
+from typing import Optional, Union
 
 
 AUTH_HEADER = "X-Notifications-Token"
 
+# Seconds an authenticated client is cached for
+CLIENT_AUTH_CACHE_TTL = 5 * 60
+
+CLIENT_INFO_FIELDS = ["name", "enabled", "is_client_manager", "managed_by"]
+
 
 def get_active_notification_client() -> Union[str, None]:
     import base64
@@ -28,20 +36,85 @@ def get_active_notification_client() -> Union[str, None]:
     except BaseException:
         return None
 
-    doctype = "Notification Client"
-    client = frappe.db.get_value(doctype, {"api_key": api_key})
+    client = get_authenticated_client(api_key, api_secret)
     if not client:
         return None
 
-    doc_secret = frappe.utils.password.get_decrypted_password(
-        doctype, client, fieldname='api_secret')
+    set_active_notification_client(client.name)
+    frappe.local.notification_client_info = client
+    return client.name
+
+
+def set_active_notification_client(client: str):
+    frappe.local.notification_client = client
+    frappe.local.notification_client_info = None
+
+
+def get_active_notification_client_info() -> Optional[frappe._dict]:
+    """
+    name, enabled, is_client_manager & managed_by of the active client
+    """
+    client = get_active_notification_client()
+    if not client:
+        return None
+
+    info = getattr(frappe.local, "notification_client_info", None)
+    if not info or info.name != client:
+        info = frappe.db.get_value("Notification Client", client, CLIENT_INFO_FIELDS, as_dict=1)
+        frappe.local.notification_client_info = info
+
+    return info
+
+
+def get_authenticated_client(api_key: str, api_secret: str) -> Optional[frappe._dict]:
+    """
+    Returns the info of the enabled client with the credentials, None otherwise
+
+    The client is cached against its api_key for CLIENT_AUTH_CACHE_TTL, along with a hash of
+    its credentials to check the secret against. This saves a query & a decryption per request
+    The cache is dropped when the client is updated. Check clear_client_auth_cache
+    """
+    if not api_key or not api_secret:
+        return None
+
+    cache_key = _get_client_auth_cache_key(api_key)
+    client = frappe.cache().get_value(cache_key)
+    if client is None:
+        doctype = "Notification Client"
+        client = frappe.db.get_value(doctype, {"api_key": api_key}, CLIENT_INFO_FIELDS, as_dict=1)
+        if not client:
+            return None
+
+        doc_secret = frappe.utils.password.get_decrypted_password(
+            doctype, client.name, fieldname='api_secret', raise_exception=False)
+        client.credentials_hash = _get_credentials_hash(api_key, doc_secret)
 
-    if doc_secret != api_secret:
+        frappe.cache().set_value(cache_key, client, expires_in_sec=CLIENT_AUTH_CACHE_TTL)
+
+    client = frappe._dict(client)
+    if not hmac.compare_digest(
+            client.pop("credentials_hash") or "", _get_credentials_hash(api_key, api_secret)):
+        return None
+
+    if not client.enabled:
         return None
 
-    set_active_notification_client(client)
     return client
 
 
-def set_active_notification_client(client: str):
-    frappe.local.notification_client = client
+def clear_client_auth_cache(api_key: str):
+    if api_key:
+        frappe.cache().delete_value(_get_client_auth_cache_key(api_key))
+
+    frappe.local.notification_client_info = None
+
+
+def _get_client_auth_cache_key(api_key: str):
+    return f"frappe_notification:client_auth:{api_key}"
+
+
+def _get_credentials_hash(api_key: str, api_secret: Optional[str]) -> str:
+    if not api_secret:
+        return ""
+
+    return hashlib.sha256(frappe.safe_encode(f"{api_key}:{api_secret}")).hexdigest()
@@ -0,0 +1,84 @@
+from typing import Callable, Dict
+
+import frappe
+
+from .throttle import _get_script
+
+# KEYS[1]: Counter
+# ARGV: delta
+# Counters missing in redis are left to be rebuilt on their next read, from the db
+_INCR_IF_EXISTS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("INCRBY", KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+def get_counter(key: str, resolver: Callable[[], int], expires_in_sec: int) -> int:
+    """
+    Counter maintained in redis, shared by all the workers of the site
+    Built with `resolver` when missing, & kept for `expires_in_sec` from then.
+    The expiry bounds the drift from the updates missed, like ones of rolled back transactions
+    """
+    cache = frappe.cache()
+    redis_key = cache.make_key(key)
+
+    value = cache.get(redis_key)
+    if value is None:
+        # A counter set meanwhile by a concurrent read is kept
+        cache.set(redis_key, int(resolver() or 0), ex=expires_in_sec, nx=True)
+        value = cache.get(redis_key)
+
+    return max(int(value or 0), 0)
+
+
+def incr_counters(deltas: Dict[str, int]):
+    """
+    Increments the counters that are in redis by their delta, the missing ones are left alone
+    """
+    cache = frappe.cache()
+    script = _get_script(_INCR_IF_EXISTS_SCRIPT)
+    for key, delta in deltas.items():
+        if delta:
+            script(keys=[cache.make_key(key)], args=[delta])
+
+
+def incr_counters_after_commit(deltas: Dict[str, int]):
+    """
+    incr_counters, once the current transaction is committed. Dropped if it is rolled back,
+    so that the counters do not count the rows that never made it to the db
+    The deltas of a transaction are summed up & applied together
+    """
+    after_commit = getattr(frappe.db, "after_commit", None)
+    if frappe.flags.in_test or after_commit is None:
+        # Tests do not commit, & older versions of frappe have no commit callbacks
+        return incr_counters(deltas)
+
+    pending = getattr(frappe.local, "pending_counter_deltas", None)
+    if pending is None:
+        pending = frappe.local.pending_counter_deltas = dict()
+        after_commit.add(_flush_pending_counters)
+        frappe.db.after_rollback.add(_discard_pending_counters)
+
+    for key, delta in deltas.items():
+        pending[key] = pending.get(key, 0) + delta
+
+
+def clear_counters(*keys: str):
+    """
+    Drops the counters, to be rebuilt on their next read
+    """
+    cache = frappe.cache()
+    cache.delete(*[cache.make_key(x) for x in keys])
+
+
+def _flush_pending_counters():
+    deltas = getattr(frappe.local, "pending_counter_deltas", None)
+    frappe.local.pending_counter_deltas = None
+    if deltas:
+        incr_counters(deltas)
+
+
+def _discard_pending_counters():
+    frappe.local.pending_counter_deltas = None
@@ -1,4 +1,5 @@
 import base64
+import hashlib
 from typing import Optional, Any
 
 import frappe
@@ -28,6 +29,22 @@ class CursorPaginatorSortByField(Enum):
         return value in cls._member_names_
 
 
+class CursorPaginatorCountMode(Enum):
+    """
+    How totalCount is resolved
+    - EXACT: Counted on every call
+    - CACHED: Counted once & cached for count_cache_ttl seconds, for the same filters
+    - NONE: Not counted, totalCount is None
+    """
+    EXACT = "exact"
+    CACHED = "cached"
+    NONE = "none"
+
+    @classmethod
+    def has_value(cls, value):
+        return value in cls._value2member_map_
+
+
 class CursorPaginatorSortBy(frappe._dict):
     direction: CursorPaginatorSortByDirection
     field: CursorPaginatorSortByField
@@ -40,9 +57,13 @@ class CursorPaginatorExecutionArgs(frappe._dict):
     last: Optional[int]
     sort_by: Optional[CursorPaginatorSortBy]
     filters: Optional[Any]
+    count_mode: Optional[CursorPaginatorCountMode]
 
 
 class CursorPaginator(object):
+    # Seconds totalCount is cached for, with CursorPaginatorCountMode.CACHED
+    DEFAULT_COUNT_CACHE_TTL = 60
+
     def __init__(
         self,
         doctype,
@@ -54,8 +75,18 @@ class CursorPaginator(object):
         node_resolver=None,
         default_sorting_fields=None,
         default_sorting_direction=None,
-        extra_args=None
+        extra_args=None,
+        count_mode=None,
+        count_cache_ttl=None,
+        count_cache_key=None
     ):
+        """
+        count_mode (CursorPaginatorCountMode): Default way of resolving totalCount, EXACT if unset.
+                                               Could be overridden with args.count_mode
+        count_cache_ttl (int): Seconds totalCount is cached for, with CACHED
+        count_cache_key (list): Values the count depends on, other than the filters & extra_args
+                                Like the active user, when custom resolvers filter by it
+        """
 
         if (not count_resolver) != (not node_resolver):
             frappe.throw(
@@ -74,6 +105,10 @@ class CursorPaginator(object):
         # Extra Args are helpful for custom resolvers
         self.extra_args = extra_args
 
+        self.count_mode = count_mode or CursorPaginatorCountMode.EXACT
+        self.count_cache_ttl = count_cache_ttl or self.DEFAULT_COUNT_CACHE_TTL
+        self.count_cache_key = count_cache_key
+
     def execute(self, args: CursorPaginatorExecutionArgs):
 
         self.validate_connection_args(args)
@@ -105,7 +140,7 @@ class CursorPaginator(object):
         if not self.skip_process_filters:
             self.filters = self.process_filters(self.filters)
 
-        count = self.get_count(self.doctype, self.filters)
+        count = self.resolve_count(self.doctype, self.filters, args.get("count_mode"))
 
         if self.cursor:
             # Cursor filter should be applied after taking count
@@ -158,6 +193,36 @@ class CursorPaginator(object):
             raise Exception("Argument `first` cannot be combined with `before`.")
         if last and args.get("after"):
             raise Exception("Argument `last` cannot be combined with `after`.")
+        count_mode = args.get("count_mode")
+        if isinstance(count_mode, str) and \
+                not CursorPaginatorCountMode.has_value(count_mode.lower()):
+            raise Exception("Argument `count_mode` must be one of exact, cached or none.")
+
+    def resolve_count(self, doctype, filters, count_mode=None):
+        count_mode = count_mode or self.count_mode
+        if isinstance(count_mode, str):
+            count_mode = CursorPaginatorCountMode(count_mode.lower())
+
+        if count_mode == CursorPaginatorCountMode.NONE:
+            return None
+
+        if count_mode == CursorPaginatorCountMode.EXACT:
+            return self.get_count(doctype, filters)
+
+        key = self.get_count_cache_key(doctype, filters)
+        count = frappe.cache().get_value(key)
+        if count is None:
+            count = self.get_count(doctype, filters)
+            frappe.cache().set_value(key, count, expires_in_sec=self.count_cache_ttl)
+
+        return count
+
+    def get_count_cache_key(self, doctype, filters):
+        _hash = hashlib.sha1(frappe.as_json([
+            doctype, filters, self.or_filters, self.extra_args, self.count_cache_key,
+        ], indent=None).encode()).hexdigest()
+
+        return f"cursor_paginator_count:{_hash}"
 
     def get_count(self, doctype, filters):
         if self.custom_count_resolver:
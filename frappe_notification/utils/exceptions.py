@@ -136,3 +136,11 @@ class NotificationOutboxNotFound(FrappeNotificationException):
         self.data = frappe._dict(
             outbox=outbox
         )
+
+
+class RateLimitExceeded(FrappeNotificationException):
+    def __init__(self, retry_after: float):
+        self.error_code = "RATE_LIMIT_EXCEEDED"
+        self.message = frappe._("Rate Limit Exceeded")
+        self.http_status_code = 429
+        self.data = frappe._dict(retry_after=retry_after)
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import frappe
+from frappe.utils.jinja import get_jenv
+from jinja2 import Template, TemplateError
+
+# Number of compiled templates kept in each process
+TEMPLATE_CACHE_SIZE = 512
+
+_compiled_templates: "OrderedDict[Tuple, Any]" = OrderedDict()
+_lock = threading.Lock()
+_stats = frappe._dict(hits=0, misses=0)
+
+
+def get_cached_template(key: Optional[Tuple[Hashable, ...]], source: str) -> Optional[Template]:
+    """
+    The compiled Jinja Template of the source, bound to the environment of the current request
+    Useful when the same source is rendered against many contexts in a loop
+    Returns None for an empty source. The cache is skipped when key is None
+    """
+    if not source:
+        return None
+
+    if ".__" in source:
+        frappe.throw(frappe._("Illegal template"))
+
+    jenv = get_jenv()
+    try:
+        code = jenv.compile(source) if key is None else _get_compiled_template(key, source, jenv)
+    except TemplateError:
+        _throw_template_error(source)
+
+    return jenv.template_class.from_code(jenv, code, jenv.make_globals(None))
+
+
+def render_template(template: Optional[Template], context: dict, source: str = None) -> str:
+    """
+    Renders a Template from get_cached_template, with the errors of frappe.render_template
+    """
+    if not template:
+        return ""
+
+    try:
+        return template.render(context)
+    except TemplateError:
+        _throw_template_error(source)
+
+
+def invalidate_template_cache(prefix: Tuple[Hashable, ...]):
+    """
+    Drops the compiled templates with keys starting with `prefix`, from this process
+    Entries in the other processes are left to be evicted, as long as their keys include `modified`
+    """
+    prefix = (frappe.local.site, *prefix)
+    with _lock:
+        for key in [x for x in _compiled_templates if x[:len(prefix)] == prefix]:
+            del _compiled_templates[key]
+
+
+def clear_template_cache():
+    with _lock:
+        _compiled_templates.clear()
+        _stats.update(hits=0, misses=0)
+
+
+def get_template_cache_info() -> frappe._dict:
+    """
+    Hits, misses & size of the compiled template cache of this process
+    """
+    return frappe._dict(
+        hits=_stats.hits,
+        misses=_stats.misses,
+        size=len(_compiled_templates),
+        max_size=TEMPLATE_CACHE_SIZE)
+
+
+def _throw_template_error(source: str):
+    frappe.throw(
+        title="Jinja Template Error",
+        msg="<pre>{template}</pre><pre>{tb}</pre>".format(
+            template=source or "", tb=frappe.get_traceback()))
+
+
+def _get_compiled_template(key: Tuple[Hashable, ...], source: str, jenv):
+    key = (frappe.local.site, *key)
+    with _lock:
+        if key in _compiled_templates:
+            _stats.hits += 1
+            _compiled_templates.move_to_end(key)
+            return _compiled_templates[key]
+
+        _stats.misses += 1
+
+    code = jenv.compile(source)
+
+    with _lock:
+        _compiled_templates[key] = code
+        while len(_compiled_templates) > TEMPLATE_CACHE_SIZE:
+            _compiled_templates.popitem(last=False)
+
+    return code
@@ -90,3 +90,52 @@ class TestGetActiveNotificationClient(TestCase):
         set_active_notification_client(client.name)
 
         self.assertEqual(get_active_notification_client(), client.name)
+
+    @patch_get_request_header
+    def test_auth_cache(self, mock_get_request_header: MagicMock):
+        client = self.clients[0]
+        mock_get_request_header.return_value = f"Token {self.get_token(client)}"
+
+        self.assertEqual(get_active_notification_client(), client.name)
+
+        # No more lookups for the same credentials
+        set_active_notification_client(None)
+        with patch("frappe.utils.password.get_decrypted_password") as get_decrypted_password:
+            self.assertEqual(get_active_notification_client(), client.name)
+            get_decrypted_password.assert_not_called()
+
+    @patch_get_request_header
+    def test_auth_cache_new_secret(self, mock_get_request_header: MagicMock):
+        client = frappe.get_doc("Notification Client", self.clients[0].name)
+        old_token = f"Token {self.get_token(client)}"
+        mock_get_request_header.return_value = old_token
+
+        self.assertEqual(get_active_notification_client(), client.name)
+
+        client.generate_new_secret()
+        self.addCleanup(lambda: self.clients[0].reload())
+
+        set_active_notification_client(None)
+        self.assertIsNone(get_active_notification_client())
+
+        mock_get_request_header.return_value = f"Token {self.get_token(client)}"
+        self.assertEqual(get_active_notification_client(), client.name)
+
+    @patch_get_request_header
+    def test_disabled_client(self, mock_get_request_header: MagicMock):
+        client = frappe.get_doc("Notification Client", self.clients[0].name)
+        mock_get_request_header.return_value = f"Token {self.get_token(client)}"
+
+        self.assertEqual(get_active_notification_client(), client.name)
+
+        client.enabled = 0
+        client.save()
+
+        def _enable():
+            client.enabled = 1
+            client.save()
+
+        self.addCleanup(_enable)
+
+        set_active_notification_client(None)
+        self.assertIsNone(get_active_notification_client())
@@ -0,0 +1,150 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import frappe
+
+from .exceptions import RateLimitExceeded
+
+# KEYS[1]: Sorted set of the slots held, scored by their expiry
+# ARGV: now, expiry, limit, token
+_ACQUIRE_SLOT_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1])
+if redis.call("ZCARD", KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call("ZADD", KEYS[1], ARGV[2], ARGV[4])
+    redis.call("EXPIRE", KEYS[1], math.ceil(ARGV[2] - ARGV[1]))
+    return 1
+end
+return 0
+"""
+
+# KEYS[1]: Sorted set of the slots held, scored by their expiry
+# ARGV: now, expiry, token
+_REFRESH_SLOT_SCRIPT = """
+if redis.call("ZSCORE", KEYS[1], ARGV[3]) then
+    redis.call("ZADD", KEYS[1], ARGV[2], ARGV[3])
+    redis.call("EXPIRE", KEYS[1], math.ceil(ARGV[2] - ARGV[1]))
+    return 1
+end
+return 0
+"""
+
+# KEYS[1]: Hash with the tokens left in the bucket & when it was last refilled
+# ARGV: now, rate, burst, max_wait
+# Takes a token even when the bucket is empty, so that waiting callers line up one after
+# the other. Returns the seconds the caller has to wait before using its token
+# The token is not taken when the wait is over max_wait, so that the line is never longer
+_TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = math.max(0, 1 - tokens) / rate
+if wait <= max_wait then
+    tokens = tokens - 1
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("EXPIRE", KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+# Seconds rate_limit sleeps for a token, at the most
+MAX_RATE_LIMIT_WAIT = 5
+
+_scripts = dict()
+
+
+@contextmanager
+def concurrency_limit(key: str, limit: int, expires_in: int):
+    """
+    Lets in at most `limit` holders of `key` at once, across all the workers of the site.
+    Doesn't wait for a slot: yields False when all of them are held, so that the caller could
+    try again later without holding up its worker
+
+    The slot is refreshed every third of `expires_in` while it is held, so that it expires only
+    when its holder is gone, like a worker that crashed
+
+    args:
+        key (str): Identifies the resource being limited
+        limit (int): Maximum number of concurrent holders
+        expires_in (int): Seconds a slot is held for without a refresh. Ideally the job timeout
+    """
+    token = acquire_slot(key, limit, expires_in)
+    if not token:
+        yield False
+        return
+
+    # make_key & the scripts need the site, which is not available on other threads
+    redis_key = _get_slot_key(key)
+    refresh = _get_script(_REFRESH_SLOT_SCRIPT)
+    released = threading.Event()
+
+    def _keep_refreshing():
+        while not released.wait(expires_in / 3):
+            refresh(keys=[redis_key], args=[time.time(), time.time() + expires_in, token])
+
+    threading.Thread(target=_keep_refreshing, daemon=True).start()
+    try:
+        yield True
+    finally:
+        released.set()
+        release_slot(key, token)
+
+
+def acquire_slot(key: str, limit: int, expires_in: int) -> Optional[str]:
+    """
+    Takes one of the `limit` slots of `key`, if any of them is free
+    Returns the token the slot is held with, None otherwise
+    """
+    token = uuid.uuid4().hex
+    if not _get_script(_ACQUIRE_SLOT_SCRIPT)(
+            keys=[_get_slot_key(key)], args=[time.time(), time.time() + expires_in, limit, token]):
+        return None
+
+    return token
+
+
+def release_slot(key: str, token: str):
+    frappe.cache().zrem(_get_slot_key(key), token)
+
+
+def rate_limit(key: str, rate: float, burst: int = None, max_wait: float = MAX_RATE_LIMIT_WAIT):
+    """
+    Token bucket shared by all the workers of the site. Takes a token from the bucket of `key`,
+    sleeping till one is available, for upto `max_wait` seconds.
+    Raises RateLimitExceeded when the wait would be longer, without taking a token. The caller
+    is expected to try again after its retry_after, instead of holding up its worker
+
+    args:
+        key (str): Identifies the bucket
+        rate (float): Tokens added to the bucket per second
+        burst (int): Size of the bucket, ie, tokens that can be taken at once after being idle.
+                     Defaults to the rate
+        max_wait (float): Longest the caller would sleep for a token
+    """
+    burst = max(burst or int(rate), 1)
+    redis_key = frappe.cache().make_key(f"frappe_notification:rate_limit:{key}")
+
+    wait = float(_get_script(_TAKE_TOKEN_SCRIPT)(
+        keys=[redis_key], args=[time.time(), rate, burst, max_wait]))
+    if wait > max_wait:
+        raise RateLimitExceeded(retry_after=wait)
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _get_slot_key(key: str):
+    return frappe.cache().make_key(f"frappe_notification:concurrency:{key}")
+
+
+def _get_script(script: str):
+    if script not in _scripts:
+        _scripts[script] = frappe.cache().register_script(script)
+
+    return _scripts[script]